@@ -1,66 +1,113 @@
 import streamlit as st
-import tensorflow as tf
-import numpy as np
-import json
 import os
-from datetime import datetime
-
-# TensorFlow Model Prediction
-def model_prediction(test_image):
-    model = tf.keras.models.load_model("trained_plant_disease_model.h5")
-    image = tf.keras.preprocessing.image.load_img(test_image, target_size=(128, 128))
-    input_arr = tf.keras.preprocessing.image.img_to_array(image)
-    input_arr = np.array([input_arr])
-    predictions = model.predict(input_arr)
-    return np.argmax(predictions)
-
-# Load user data
-def load_user_data():
-    if os.path.exists('user_data.json'):
-        with open('user_data.json', 'r') as f:
-            return json.load(f)
-    return {}
-
-# Save user data
-def save_user_data(user_data):
-    with open('user_data.json', 'w') as f:
-        json.dump(user_data, f)
+from datetime import datetime, timedelta
+import model_registry
+import batching_server
+import prediction_cache
+import submission_store
+import user_store
+import thumbnails
+import image_ingest
+import metrics
+import class_metadata
+import calibration
+import job_queue
+import prediction_jobs
+
+# TensorFlow Model Prediction, micro-batched with other sessions
+def model_prediction(artifacts):
+    return model_prediction_batch([artifacts])[0]
+
+# TensorFlow Model Prediction for several ingested images, repeated uploads come from the cache.
+# Returns the calibrated top-k [(class index, probability), ...] of every image.
+def model_prediction_batch(artifacts_list):
+    return prediction_jobs.predict_top_k(artifacts_list)
 
 # Log user inputs
 def log_image_input(mobile_number, image_path, prediction):
-    if not os.path.exists('user_inputs.json'):
-        with open('user_inputs.json', 'w') as f:
-            json.dump([], f)
-    with open('user_inputs.json', 'r') as f:
-        inputs = json.load(f)
-    input_data = {
-        "mobile_number": mobile_number,
-        "image_path": image_path,
-        "prediction": prediction,
-        "timestamp": str(datetime.now())
-    }
-    inputs.append(input_data)
-    with open('user_inputs.json', 'w') as f:
-        json.dump(inputs, f)
-
-# Save uploaded image
+    return submission_store.add_submission(mobile_number, image_path, prediction, str(datetime.now()))
+
+# Save uploaded image: content-addressed original, model tensor and thumbnail; non-leaf photos raise image_ingest.Rejected
 def save_uploaded_file(uploaded_file):
-    upload_dir = 'uploaded_images/'
-    if not os.path.exists(upload_dir):
-        os.makedirs(upload_dir)
-    file_path = os.path.join(upload_dir, uploaded_file.name)
-    with open(file_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
-    return file_path
+    return image_ingest.ingest_upload(uploaded_file, calibration.leaf_check)
+
+# Show finished predictions: the full answer for one image, a table for several
+def show_results(names, results):
+    if len(results) == 1:
+        result = results[0]
+        st.success(f"Model predicts: {result['রোগ']} ({result['confidence']:.0%})")
+        if result["confidence"] < calibration.MIN_CONFIDENCE:
+            st.warning("The model is not confident about this image, please check the alternatives or upload a clearer photo.")
+        st.info(f"কেন হয়: {result['কেন হয়']}")
+        st.warning(f"প্রতিকার: {result['প্রতিকার']}")
+        for alternative in result["top_k"][1:]:
+            st.write(f"↳ {class_table.names['bn'][class_table.index_of(alternative['label'])].strip()}: {alternative['probability']:.0%}")
+    elif results:
+        results_table = []
+        for name, result in zip(names, results):
+            ranked = [(class_table.index_of(alternative["label"]), alternative["probability"]) for alternative in result["top_k"]]
+            confidence = result["confidence"]
+            results_table.append({"ছবি": name, "রোগ": result["রোগ"], "নিশ্চয়তা": f"{confidence:.0%}",
+                                  "অন্যান্য সম্ভাবনা": ", ".join(f"{class_table.names['bn'][index].strip()} ({probability:.0%})"
+                                                          for index, probability in ranked[1:])})
+        st.success(f"Model predicted {len(results)} images.")
+        st.table(results_table)
+
+# Queued predictions of this session. While some are waiting this runs as a fragment every
+# POLL_INTERVAL_SECONDS, without re-running or blocking the rest of the page.
+def show_pending_jobs(polling):
+    pending = st.session_state.pending_jobs
+    jobs = job_queue.get_jobs([job_id for job_id, _ in pending])
+    finished = [(name, jobs[job_id]) for job_id, name in pending if job_id in jobs and jobs[job_id]["status"] in ("done", "failed")]
+    waiting = [(job_id, name) for job_id, name in pending if job_id in jobs and jobs[job_id]["status"] not in ("done", "failed")]
+    for job_id, name in waiting:
+        st.info(f"⏳ {name}: waiting for the model ({job_queue.position(job_id)} images ahead)")
+    for name, job in finished:
+        if job["status"] == "failed":
+            st.error(f"{name}: prediction failed ({job['error']})")
+    done = [(name, job["result"]) for name, job in finished if job["status"] == "done"]
+    show_results([name for name, _ in done], [result for _, result in done])
+    if polling and not waiting:
+        st.rerun()  # Full run of the page, which stops the polling
+
+# True while any of the queued predictions is not finished
+def jobs_waiting(pending):
+    jobs = job_queue.get_jobs([job_id for job_id, _ in pending])
+    return any(job["status"] not in ("done", "failed") for job in jobs.values())
+
+# Queue predictions for background workers instead of running the CNN inside the script run
+ASYNC_PREDICTIONS = os.environ.get("PLANT_ASYNC_PREDICTIONS", "0") == "1"
+POLL_INTERVAL_SECONDS = 0.5
 
 # Admin credentials
 ADMIN_CREDENTIALS = {"admin": "admin"}
 
+# Label order, localized names and remedies for the model's outputs, parsed once per process
+class_table = class_metadata.get_class_table()
+
+# Predictions run in this process unless it only queues them for separate workers (fleet.py serve)
+LOCAL_PREDICTIONS = not ASYNC_PREDICTIONS or prediction_jobs.WORKERS > 0
+
+# Load the model once per process before the first prediction
+if LOCAL_PREDICTIONS:
+    model_registry.warm_up()
+if ASYNC_PREDICTIONS:
+    prediction_jobs.get_pool()
+
+# Per-stage timers and counters, served on PLANT_METRICS_PORT and/or written to PLANT_METRICS_FILE
+metrics.register_collector("prediction_cache", lambda: prediction_cache.get_cache().stats())
+if LOCAL_PREDICTIONS:
+    metrics.register_collector("batcher", lambda: batching_server.get_batcher().metrics())
+metrics.register_collector("queue", job_queue.stats)
+metrics.start_http_server()
+
 # Session state initialization
 if 'logged_in' not in st.session_state:
     st.session_state.logged_in = False
 if 'is_admin' not in st.session_state:
     st.session_state.is_admin = False
+if 'mobile_number' not in st.session_state:
+    st.session_state.mobile_number = None
 if 'app_mode' not in st.session_state:
     st.session_state.app_mode = "Home"
 
@@ -83,13 +130,11 @@ if st.session_state.logged_in:
     if st.sidebar.button("Logout"):
         st.session_state.logged_in = False
         st.session_state.is_admin = False
+        st.session_state.mobile_number = None
         st.session_state.app_mode = "Home"
         st.success("You have logged out successfully.")
         st.rerun()
 
-# Load user data
-user_data = load_user_data()
-
 # Home Page
 if st.session_state.app_mode == "Home":
     st.header("PLANT DISEASE RECOGNITION SYSTEM")
@@ -105,12 +150,14 @@ if st.session_state.app_mode == "Home":
 # Login Page
 elif st.session_state.app_mode == "Login":
     st.subheader("Login")
-    username = st.text_input("Username")
+    username = st.text_input("Username or Mobile Number")
     password = st.text_input("Password", type="password")
     if st.button("Login"):
-        if username in user_data and user_data[username]['password'] == password:
+        user = user_store.authenticate(username, password)
+        if user is not None:
             st.success("Logged in successfully.")
             st.session_state.logged_in = True
+            st.session_state.mobile_number = user["mobile_number"]
             st.session_state.app_mode = "Disease Recognition"
             st.rerun()
         elif username in ADMIN_CREDENTIALS and ADMIN_CREDENTIALS[username] == password:
@@ -128,60 +175,56 @@ elif st.session_state.app_mode == "Disease Recognition":
         st.warning("Please log in to access Disease Recognition.")
     else:
         st.header("Disease Recognition")
-        test_image = st.file_uploader("Choose an Image:")
-        if st.button("Predict") and test_image:
-            image_path = save_uploaded_file(test_image)
-            st.image(image_path, use_container_width=True)
-            st.snow()
-            result_index = model_prediction(image_path)
-
-            # Define disease class names and descriptions here
-            class_name = [
-                 {"রোগ": "আপেল স্ক্যাব", "কেন হয়": "আর্দ্র আবহাওয়া ও অতিরিক্ত পানির কারণে ছত্রাক জন্মায়।", "প্রতিকার": "আক্রান্ত পাতা ছেঁটে ফেলুন, কপার ছত্রাকনাশক স্প্রে করুন। নিয়মিত ছাঁটাই ও পানি নিষ্কাশনের ব্যবস্থা নিন।"},
-                 {"রোগ": "আপেল ব্ল্যাক রট", "কেন হয়": "পচা ফল বা পুরনো ডালে ছত্রাক জন্ম নিয়ে ছড়ায়।","প্রতিকার": "পচা ফল ও ডাল কেটে ফেলুন, ছত্রাকনাশক ব্যবহার করুন। গাছের নিচে পড়ে থাকা ফল নিয়মিত পরিষ্কার করুন।"},
-                 {"রোগ": "সিডার আপেল রস্ট","কেন হয়": "আপেল গাছের কাছে সিডার গাছ থাকলে ছত্রাক ছড়ায়।", "প্রতিকার": "সিডার গাছ সরান, ছত্রাকনাশক ব্যবহার করুন। কাছাকাছি সিডার গাছ না রাখলে রোগ হবে না।"}, 
-                 {"রোগ":"আপেল___সুস্থ     গাছটি সুস্থ! 🌱 ", "কেন হয়": "", "প্রতিকার": "গাছকে সুস্থ রাখতে নিয়মিত পানি, আলো ও সার দেওয়া উচিত।"},
-                 {"রোগ":"ব্লুবেরি___সুস্থ     গাছটি সুস্থ! 🌱 ", "কেন হয়": "", "প্রতিকার": "গাছকে সুস্থ রাখতে নিয়মিত পানি, আলো ও সার দেওয়া উচিত।"}, 
-                 {"রোগ": "চেরি পাউডারি মিলডিউ","কেন হয়": "শুষ্ক আবহাওয়ায় পাতায় ছত্রাকের স্তর জমে।", "প্রতিকার": "সালফার স্প্রে দিন, বাতাস চলাচলের ব্যবস্থা রাখুন। গাছ খুব ঘন না হলে রোগ কম হয়।"},
-                 {"রোগ":"চেরি (টকসহ)___সুস্থ     গাছটি সুস্থ! 🌱 ", "কেন হয়": "", "প্রতিকার": "গাছকে সুস্থ রাখতে নিয়মিত পানি, আলো ও সার দেওয়া উচিত।"}, 
-                 {"রোগ": "ভুট্টা সারকোসপোরা পাতা দাগ",  "কেন হয়": "গরম ও আর্দ্র আবহাওয়া।","প্রতিকার": "পাতা ছেঁটে ফেলুন এবং ছত্রাকনাশক স্প্রে করুন। সঠিক পানি সরবরাহ নিশ্চিত করুন।"},
-                 {"রোগ": "ভুট্টা কমন রস্ট", "কেন হয়": "আর্দ্র ও ঠাণ্ডা আবহাওয়ায় ছত্রাকের বীজ ছড়ায়।",  "প্রতিকার": "রোগমুক্ত জাত লাগান, ছত্রাকনাশক ব্যবহার করুন। জমিতে আগের রোগমুক্ত ফসল চাষে সাহায্য পাবে।"}, 
-                 {"রোগ": "ভুট্টা নর্দার্ন পাতা ব্লাইট", "কেন হয়": "আর্দ্র আবহাওয়া ও দীর্ঘ সময় বৃষ্টির কারণে ছত্রাক আক্রমণ।", "প্রতিকার": "গাছের ঘনত্ব কমিয়ে দিন, রোগমুক্ত জাত ব্যবহার করুন।"},
-                 {"রোগ":"ভুট্টা___সুস্থ     গাছটি সুস্থ! 🌱 ", "কেন হয়": "", "প্রতিকার": "গাছকে সুস্থ রাখতে নিয়মিত পানি, আলো ও সার দেওয়া উচিত।"},
-                 {"রোগ": "আঙ্গুর ব্ল্যাক রট",  "কেন হয়": "আর্দ্র আবহাওয়া ও পচা ফল থেকে ছত্রাক ছড়ায়।","প্রতিকার": "আক্রান্ত ফল ও ডাল কেটে ফেলুন, ছত্রাকনাশক ব্যবহার করুন।"}, 
-                 {"রোগ": "আঙ্গুর এসকা (ব্ল্যাক মিজলস)", "কেন হয়": "অতিরিক্ত আর্দ্রতা ও দীর্ঘকালীন উচ্চ তাপমাত্রা।","প্রতিকার": "আক্রান্ত লতা সরিয়ে ফেলুন, ছত্রাকনাশক স্প্রে করুন।"}, 
-                 {"রোগ": "আঙ্গুর পাতা ব্লাইট (আইসারিওপসিস পাতা দাগ)",  "কেন হয়": "বৃষ্টি ও আর্দ্রতার কারণে ছত্রাক ছড়ায়।","প্রতিকার": "গাছের ডাল ছেঁটে ফেলুন, ছত্রাকনাশক স্প্রে করুন।"},
-                 {"রোগ":"আঙ্গুর___সুস্থ --- গাছটি সুস্থ! 🌱",  "কেন হয়": "", "প্রতিকার": "গাছকে সুস্থ রাখতে নিয়মিত পানি, আলো ও সার দেওয়া উচিত।"},
-                 {"রোগ": "কমলা হুয়াংলংবিং (সাইট্রাস গ্রিনিং)","কেন হয়": "সাদা মাছি দ্বারা ভাইরাস সংক্রমণ।", "প্রতিকার": "সাদা মাছি নিয়ন্ত্রণ করুন, আক্রান্ত গাছ সরান।"}, 
-                 {"রোগ": "পিচ ব্যাকটেরিয়াল স্পট", "কেন হয়": "আর্দ্র আবহাওয়া ও উচ্চ তাপমাত্রা।","প্রতিকার": "তামা ভিত্তিক ছত্রাকনাশক ব্যবহার করুন। আক্রান্ত গাছ সরান।"},
-                 {"রোগ":"পিচ___সুস্থ     গাছটি সুস্থ! 🌱 ", "কেন হয়": "", "প্রতিকার": "গাছকে সুস্থ রাখতে নিয়মিত পানি, আলো ও সার দেওয়া উচিত।"}, 
-                 {"রোগ": "বেল মরিচ ব্যাকটেরিয়াল স্পট", "কেন হয়": "শীতল ও আর্দ্র আবহাওয়া।","প্রতিকার": "বেল মরিচের ডাল ও পাতা ছেঁটে ফেলুন, কপার স্প্রে ব্যবহার করুন।"}, 
-                 {"রোগ":"বেল মরিচ___সুস্থ     গাছটি সুস্থ! 🌱 ", "কেন হয়": "", "প্রতিকার": "গাছকে সুস্থ রাখতে নিয়মিত পানি, আলো ও সার দেওয়া উচিত।"},
-                 {"রোগ": "আলু আর্লি ব্লাইট",  "কেন হয়": "শীতল ও আর্দ্র আবহাওয়া।", "প্রতিকার": "অস্তিত্বশীল আলু জাত ব্যবহার করুন, সঠিক সার ও পানি ব্যবহার করুন।"}, 
-                 {"রোগ": "আলু লেট ব্লাইট",  "কেন হয়": "ঠাণ্ডা ও আর্দ্র পরিবেশে ছত্রাকের বৃদ্ধি।", "প্রতিকার": "ছত্রাকনাশক স্প্রে করুন এবং জমিতে আগের রোগমুক্ত ফসল চাষ করুন।"},
-                 {"রোগ":"আলু___সুস্থ     গাছটি সুস্থ! 🌱 ", "কেন হয়": "", "প্রতিকার": "গাছকে সুস্থ রাখতে নিয়মিত পানি, আলো ও সার দেওয়া উচিত।"}, 
-                 {"রোগ":"রাস্পবেরি___সুস্থ     গাছটি সুস্থ! 🌱 ", "কেন হয়": "", "প্রতিকার": "গাছকে সুস্থ রাখতে নিয়মিত পানি, আলো ও সার দেওয়া উচিত।"},
-                 {"রোগ":"সয়াবিন___সুস্থ      গাছটি সুস্থ! 🌱 ", "কেন হয়": "", "প্রতিকার": "গাছকে সুস্থ রাখতে নিয়মিত পানি, আলো ও সার দেওয়া উচিত।"}, 
-                 {"রোগ": "স্কোয়াশ পাউডারি মিলডিউ", "কেন হয়": "আর্দ্র আবহাওয়া ও কম বাতাস চলাচল।","প্রতিকার": "সালফার স্প্রে দিন, বাতাস চলাচলের ব্যবস্থা রাখুন।"}, 
-                 {"রোগ": "স্ট্রবেরি পাতার স্কর্চ", "কেন হয়": "গরম ও আর্দ্র আবহাওয়া।", "প্রতিকার": "পাতা ছেঁটে ফেলুন এবং ছত্রাকনাশক স্প্রে করুন।"},
-                 {"রোগ":"স্ট্রবেরি___সুস্থ     গাছটি সুস্থ! 🌱 ", "কেন হয়": "", "প্রতিকার": "গাছকে সুস্থ রাখতে নিয়মিত পানি, আলো ও সার দেওয়া উচিত।"},
-                 {"রোগ": "মিষ্টি আলু সুস্থ     গাছটি সুস্থ! 🌱 ", "কেন হয়": "", "প্রতিকার": "গাছকে সুস্থ রাখতে নিয়মিত পানি, আলো ও সার দেওয়া উচিত।"}, 
-                 {"রোগ": "টমেটো ব্যাকটেরিয়াল স্পট", "কেন হয়": "অতিরিক্ত আর্দ্রতা ও সঠিক পরিচর্যার অভাব।",  "প্রতিকার": "কপার ছত্রাকনাশক স্প্রে করুন।"},    
-                 {"রোগ":"মিষ্টি আলু সুস্থ     গাছটি সুস্থ! 🌱 ", "কেন হয়": "", "প্রতিকার": "গাছকে সুস্থ রাখতে নিয়মিত পানি, আলো ও সার দেওয়া উচিত।"},
-                 {"রোগ": "টমেটো লেট ব্লাইট",  "কেন হয়": "গরম ও আর্দ্র আবহাওয়া।",  "প্রতিকার": "রোগমুক্ত জাত ব্যবহার করুন, ছত্রাকনাশক স্প্রে করুন।"},
-                 {"রোগ": "টমেটো পাতার ছাঁচ", "কেন হয়": "ঠাণ্ডা ও আর্দ্র আবহাওয়া।",  "প্রতিকার": "আক্রান্ত অংশ ছেঁটে ফেলুন, ছত্রাকনাশক প্রয়োগ করুন।"}, 
-                 {"রোগ": "টমেটো সেপ্টোরিয়া দাগ", "কেন হয়": "আর্দ্র আবহাওয়া।", "প্রতিকার":  "আক্রান্ত অংশ কেটে ফেলুন, ছত্রাকনাশক ব্যবহার করুন।"},
-                 {"রোগ": "টমেটো স্পাইডার মাইট",  "কেন হয়": "গরম ও শুকনো আবহাওয়া।", "প্রতিকার": "নিম তেল স্প্রে করুন এবং পোকা নিয়ন্ত্রণ করুন।"}, 
-                 {"রোগ": "টমেটো টার্গেট স্পট", "কেন হয়": "গরম ও আর্দ্র আবহাওয়া।",  "প্রতিকার": "ছত্রাকনাশক স্প্রে এবং রোগমুক্ত জাত ব্যবহার করুন।"},
-                 {"রোগ": "টমেটো ইয়েলো লিফ কার্ল ভাইরাস", "কেন হয়": "সাদা মাছি দ্বারা ভাইরাস ছড়ায়।","প্রতিকার": "সাদা মাছি নিয়ন্ত্রণ করুন, আক্রান্ত গাছ সরান।"},
-                 {"রোগ": "টমেটো মোজাইক ভাইরাস", "কেন হয়": "ভাইরাস দ্বারা সংক্রমণ।", "প্রতিকার": "রোগমুক্ত বীজ ব্যবহার করুন, গাছ ও পোকা নিয়ন্ত্রণ করুন।"},
-                 {"রোগ":"টমেটো___সুস্থ     গাছটি সুস্থ! 🌱 ", "কেন হয়": "", "প্রতিকার": "গাছকে সুস্থ রাখতে নিয়মিত পানি, আলো ও সার দেওয়া উচিত।"}]
-            
-            result = class_name[result_index]
-            st.success(f"Model predicts: {result['রোগ']}")
-            st.info(f"কেন হয়: {result['কেন হয়']}")
-            st.warning(f"প্রতিকার: {result['প্রতিকার']}")
-            log_image_input(st.session_state.app_mode, image_path, result)
+        test_images = st.file_uploader("Choose Images:", accept_multiple_files=True)
+        if st.button("Predict") and test_images:
+            metrics.inc("requests_total")
+            metrics.inc("images_total", len(test_images))
+            with metrics.request_profile("predict"):
+                try:
+                    # The leaf gate runs on the decoded tensor, rejected photos are never stored
+                    uploads = []
+                    with metrics.stage("save_upload"):
+                        for test_image in test_images:
+                            try:
+                                uploads.append(save_uploaded_file(test_image))
+                            except image_ingest.Rejected as e:
+                                metrics.inc("rejected_total")
+                                st.warning(f"{test_image.name}: skipped, {e}. Please upload a close-up photo of a leaf.")
+                            except (OSError, ValueError) as e:  # Unreadable file or over the pixel caps
+                                st.warning(f"{test_image.name}: skipped, could not read this image ({e}).")
+                    if len(uploads) == 1:
+                        st.image(uploads[0].original_path, use_container_width=True)
+                    elif uploads:
+                        st.image([upload.thumbnail_path for upload in uploads], caption=[upload.name for upload in uploads], width=150)
+                    st.snow()
+                    if ASYNC_PREDICTIONS:
+                        # Hand the CNN and the log write to the queue workers, the page polls below
+                        try:
+                            job_ids = prediction_jobs.submit(uploads, st.session_state.mobile_number) if uploads else []
+                        except job_queue.QueueFull:
+                            st.error("The server is busy right now, please try again in a minute.")
+                            job_ids = []
+                        st.session_state.pending_jobs = [(job_id, upload.name) for job_id, upload in zip(job_ids, uploads)]
+                    else:
+                        with metrics.stage("prediction"):
+                            predictions = model_prediction_batch(uploads)
+                        results = []
+                        with metrics.stage("log_submission"):
+                            for upload, ranked in zip(uploads, predictions):
+                                result = prediction_jobs.build_result(ranked)
+                                results.append(result)
+                                log_image_input(st.session_state.mobile_number, upload.original_path, result)
+                        show_results([upload.name for upload in uploads], results)
+                except Exception:
+                    metrics.inc("errors_total")
+                    metrics.write_stats_file()
+                    raise
+            metrics.write_stats_file()
+
+        # Queued predictions of this session, they stay on the page until the next submission
+        if st.session_state.get("pending_jobs"):
+            polling = jobs_waiting(st.session_state.pending_jobs)
+            st.fragment(show_pending_jobs, run_every=POLL_INTERVAL_SECONDS if polling else None)(polling)
 # Register Page
 elif st.session_state.app_mode == "Register":
     st.subheader("Register")
@@ -192,20 +235,22 @@ elif st.session_state.app_mode == "Register":
     new_password = st.text_input("Choose a Password", type="password")
     confirm_password = st.text_input("Confirm Password", type="password")
     if st.button("Register"):
-        if new_username in user_data:
-            st.warning("Username already exists.")
-        if len(mobile_number) != 11:
+        if not new_username:
+            st.error("Please choose a username.")
+        elif len(mobile_number) != 11:
             st.error("Please enter a valid 11-digit mobile number.")
-        elif mobile_number in user_data:
-            st.error("This mobile number is already registered.")
         elif new_password != confirm_password:
             st.error("Passwords do not match.")
         else:
-            user_data[new_username] = {"password": new_password}
-            save_user_data(user_data)
-            st.success("Registration successful. Please login.")
-            st.session_state.app_mode = "Login"
-            st.rerun()
+            try:
+                user_store.create_user(new_password, username=new_username, mobile_number=mobile_number,
+                                       first_name=first_name, last_name=last_name)
+            except ValueError as e:
+                st.error(str(e))
+            else:
+                st.success("Registration successful. Please login.")
+                st.session_state.app_mode = "Login"
+                st.rerun()
 
 
 # Admin Dashboard
@@ -214,41 +259,58 @@ elif st.session_state.app_mode == "Admin Dashboard":
     if st.session_state.logged_in and st.session_state.is_admin:
         st.subheader("Admin Dashboard")
 
-        admin_section = st.radio("Admin Options", ["Manage Submissions", "Manage Users"])
+        admin_section = st.radio("Admin Options", ["Manage Submissions", "Manage Users", "Manage Model"])
 
         # --- Manage Submissions ---
         if admin_section == "Manage Submissions":
-            if os.path.exists('user_inputs.json'):
-                with open('user_inputs.json', 'r') as f:
-                    inputs = json.load(f)
-
-                for idx, entry in enumerate(inputs):
-                    st.markdown(f"---\n**Submission #{idx + 1}**")
-                    st.write(f"📱 Mobile: {entry['mobile_number']}")
-                    st.write(f"🕒 Time: {entry['timestamp']}")
-                    st.write(f"🩺 Prediction: {entry['prediction']}")
-                    if os.path.exists(entry['image_path']):
-                        st.image(entry['image_path'], caption="Uploaded Image", use_container_width=True)
-                    else:
-                        st.warning(f"Image not found at {entry['image_path']}")
-
-                    col1, col2 = st.columns([1, 1])
-
-
-                    # Delete Submission
+            col1, col2, col3 = st.columns([1, 1, 1])
+            with col1:
+                date_range = st.date_input("Date range", value=())
+            with col2:
+                class_filter = st.selectbox("Prediction", ["All"] + submission_store.predicted_classes())
+            with col3:
+                mobile_filter = st.text_input("Mobile Number", max_chars=11)
+            filters = {
+                "mobile_number": mobile_filter or None,
+                "predicted_class": None if class_filter == "All" else class_filter,
+                "start": date_range[0] if len(date_range) > 0 else None,
+                "end": date_range[1] + timedelta(days=1) if len(date_range) > 1 else None,
+            }
+
+            total = submission_store.count_submissions(**filters)
+            if total:
+                col1, col2 = st.columns([1, 1])
+                with col1:
+                    page_size = st.selectbox("Per page", [10, 25, 50, 100], index=1)
+                page_count = (total + page_size - 1) // page_size
+                with col2:
+                    page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1)
+                inputs = submission_store.query_submissions(limit=page_size, offset=(page - 1) * page_size, **filters)
+                st.caption(f"Showing {len(inputs)} of {total} submissions")
+
+                selected_ids = []
+                for entry in inputs:
+                    st.markdown(f"---\n**Submission #{entry['id']}**")
+                    col1, col2 = st.columns([1, 2])
                     with col1:
-                        if st.button(f"❌ Delete Entry #{idx + 1}", key=f"delete_input_{idx}"):
-                            image_path = entry['image_path']
-                            # Delete the image file if it exists
-                            if os.path.exists(image_path):
-                                os.remove(image_path)
-                                st.warning(f"Image at {image_path} has been deleted.")
-                            # Remove the submission from the list
-                            inputs.pop(idx)
-                            with open('user_inputs.json', 'w') as f:
-                                json.dump(inputs, f)
-                            st.warning(f"Submission #{idx + 1} deleted successfully.")
-                            st.rerun()  # Reload the page to reflect the changes
+                        if os.path.exists(entry['image_path']):
+                            st.image(thumbnails.thumbnail_path(entry['image_path']), caption="Uploaded Image")
+                        else:
+                            st.warning(f"Image not found at {entry['image_path']}")
+                    with col2:
+                        st.write(f"📱 Mobile: {entry['mobile_number']}")
+                        st.write(f"🕒 Time: {entry['timestamp']}")
+                        st.write(f"🩺 Prediction: {entry['predicted_class']}")
+                        if st.checkbox("Select", key=f"select_input_{entry['id']}"):
+                            selected_ids.append(entry['id'])
+
+                # Delete the selected submissions in one go
+                if st.button(f"❌ Delete Selected ({len(selected_ids)})", disabled=not selected_ids):
+                    for image_path in submission_store.delete_submissions(selected_ids):
+                        # Delete the image file with its tensor and thumbnail
+                        image_ingest.delete_upload(image_path)
+                    st.warning(f"{len(selected_ids)} submission(s) deleted successfully.")
+                    st.rerun()  # Reload the page to reflect the changes
 
             else:
                 st.info("No submissions found.")
@@ -256,39 +318,70 @@ elif st.session_state.app_mode == "Admin Dashboard":
         # --- Manage Users ---
         elif admin_section == "Manage Users":
             st.write("Registered Users:")
-            if os.path.exists('user_data.json'):
-                with open('user_data.json', 'r') as f:
-                    users = json.load(f)
-
-                for username in list(users.keys()):
-                    st.write(f"👤 Username: `{username}`")
+            users = user_store.list_users()
+            if users:
+                for user in users:
+                    label = user["username"] or user["mobile_number"]
+                    st.write(f"👤 Username: `{user['username'] or '-'}`  📱 Mobile: `{user['mobile_number'] or '-'}`  "
+                             f"{user['first_name'] or ''} {user['last_name'] or ''}")
                     col1, col2 = st.columns([1, 1])
 
                     # Edit User Data
                     with col1:
-                        if st.button(f"📝 Edit User {username}", key=f"edit_user_{username}"):
-                            new_username = st.text_input(f"New Username for {username}", value=username, key=f"new_user_{username}")
-                            new_password = st.text_input(f"New Password for {username}", value=users[username]["password"], type="password", key=f"new_pass_{username}")
-                            if st.button("Save Changes", key=f"save_user_{username}"):
-                                users[new_username] = {"password": new_password}
-                                if new_username != username:
-                                    del users[username]
-                                with open('user_data.json', 'w') as f:
-                                    json.dump(users, f)
-                                st.success(f"User {username} updated successfully.")
-                                st.rerun()  # Reload the page to reflect changes
+                        with st.expander(f"📝 Edit User {label}"):
+                            new_username = st.text_input(f"New Username for {label}", value=user["username"] or "", key=f"new_user_{user['id']}")
+                            new_mobile = st.text_input(f"New Mobile Number for {label}", value=user["mobile_number"] or "", max_chars=11, key=f"new_mobile_{user['id']}")
+                            new_password = st.text_input(f"New Password for {label}", value=user["password"], type="password", key=f"new_pass_{user['id']}")
+                            if st.button("Save Changes", key=f"save_user_{user['id']}"):
+                                try:
+                                    user_store.update_user(user["id"], username=new_username, mobile_number=new_mobile, password=new_password)
+                                except ValueError as e:
+                                    st.error(str(e))
+                                else:
+                                    st.success(f"User {label} updated successfully.")
+                                    st.rerun()  # Reload the page to reflect changes
 
                     # Delete User Data
                     with col2:
-                        if st.button(f"❌ Delete User {username}", key=f"delete_user_{username}"):
-                            del users[username]
-                            with open('user_data.json', 'w') as f:
-                                json.dump(users, f)
-                            st.warning(f"User {username} deleted successfully.")
+                        if st.button(f"❌ Delete User {label}", key=f"delete_user_{user['id']}"):
+                            user_store.delete_user(user["id"])
+                            st.warning(f"User {label} deleted successfully.")
                             st.rerun()  # Reload the page to reflect the changes
 
             else:
                 st.info("No users registered.")
+
+        # --- Manage Model ---
+        elif admin_section == "Manage Model":
+            if LOCAL_PREDICTIONS:
+                active_path, active_version = model_registry.active_model()
+                st.write(f"🧠 Active model: `{active_path}` (version `{active_version}`)")
+            else:
+                # The fleet.py worker processes hold their own model, this process never loads one
+                st.info("🧠 Predictions run in the fleet.py worker processes, each serving the model it loaded at start. "
+                        "To change the model, restart them with `python fleet.py serve --model <path>`.")
+            st.write("🗂️ Prediction cache:")
+            st.json(prediction_cache.get_cache().stats())
+            st.write("📬 Prediction queue:")
+            st.json(job_queue.stats())
+            profiling = st.checkbox("Write a cProfile dump for every prediction request", value=metrics.profiling_enabled())
+            if profiling != metrics.profiling_enabled():
+                metrics.set_profiling(profiling)
+            with st.expander("📈 Metrics"):
+                st.code(metrics.render_prometheus(), language="text")
+            if LOCAL_PREDICTIONS:
+                new_model_path = st.text_input("New model path (.h5, .keras, SavedModel directory or .tflite)", value=active_path)
+                if st.button("Swap Model"):
+                    if os.path.exists(new_model_path):
+                        try:
+                            active_path, active_version = model_registry.swap_model(new_model_path)
+                        except Exception as e:
+                            # The old model keeps serving when the new artifact fails to load or its width check
+                            st.error(f"Could not load {new_model_path}: {e}")
+                        else:
+                            st.success(f"Now serving `{active_path}` (version `{active_version}`).")
+                    else:
+                        st.error(f"Model not found at {new_model_path}")
     else:
         st.warning("Admin access only.")
 
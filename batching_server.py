@@ -0,0 +1,186 @@
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+import numpy as np
+import tensorflow as tf
+import model_registry
+import inference
+import metrics
+
+MAX_BATCH_SIZE = 32
+MAX_WAIT_MS = 10
+
+
+# Queues single-image requests from all sessions and runs them as micro-batches
+class MicroBatcher:
+    def __init__(self, model_path=None, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        self.model_path = model_path
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._batch = np.empty((max_batch_size,) + model_registry.INPUT_SHAPE, dtype=np.float32)
+        self._stats_lock = threading.Lock()
+        self._requests = 0
+        self._batches = 0
+        self._max_queue_depth = 0
+        self._batch_sizes = Counter()
+        self._queue_wait_total = 0.0
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    # Queue one preprocessed 128x128x3 array, the future resolves to its softmax row
+    def submit(self, image_array):
+        future = Future()
+        self._queue.put((image_array, future, time.perf_counter()))
+        with self._stats_lock:
+            self._requests += 1
+            self._max_queue_depth = max(self._max_queue_depth, self._queue.qsize())
+        return future
+
+    # Decode an image (path or buffer) in the calling thread and wait for its prediction
+    def predict(self, source, timeout=None):
+        image_array = inference.load_image_into(source, np.empty(model_registry.INPUT_SHAPE, dtype=np.float32))
+        return self.submit(image_array).result(timeout)
+
+    # Submit many images at once so they can share batches with other sessions
+    def predict_many(self, sources, timeout=None):
+        return self.predict_arrays(
+            [inference.load_image_into(source, np.empty(model_registry.INPUT_SHAPE, dtype=np.float32)) for source in sources],
+            timeout)
+
+    # Same as predict_many for images that are already preprocessed 128x128x3 arrays
+    def predict_arrays(self, image_arrays, timeout=None):
+        futures = [self.submit(image_array) for image_array in image_arrays]
+        return np.stack([future.result(timeout) for future in futures])
+
+    # Gather requests until the batch is full or the oldest one has waited max_wait_ms
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return []
+        pending = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(pending) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._stopped.set()
+                break
+            pending.append(item)
+        return pending
+
+    def _run(self):
+        while not self._stopped.is_set():
+            pending = self._collect()
+            if not pending:
+                break
+            size = len(pending)
+            started = time.perf_counter()
+            for i, (image_array, _, _) in enumerate(pending):
+                self._batch[i] = image_array
+            try:
+                model = model_registry.get_model(self.model_path)
+                with metrics.stage("predict"), tf.device("/CPU:0"):
+                    predictions = np.asarray(model.predict_on_batch(self._batch[:size]))
+            except Exception as e:
+                metrics.inc("predict_errors_total")
+                for _, future, _ in pending:
+                    future.set_exception(e)
+                continue
+            for i, (_, future, _) in enumerate(pending):
+                future.set_result(predictions[i])
+            with self._stats_lock:
+                self._batches += 1
+                self._batch_sizes[size] += 1
+                self._queue_wait_total += sum(started - queued for _, _, queued in pending)
+            for _, _, queued in pending:
+                metrics.observe("queue_wait", started - queued)
+
+    # Queue depth and batch-size metrics for tuning max_batch_size / max_wait_ms
+    def metrics(self):
+        with self._stats_lock:
+            served = sum(size * count for size, count in self._batch_sizes.items())
+            return {
+                "requests_total": self._requests,
+                "batches_total": self._batches,
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self._max_queue_depth,
+                "avg_batch_size": served / self._batches if self._batches else 0.0,
+                "avg_queue_wait_ms": 1000.0 * self._queue_wait_total / served if served else 0.0,
+                "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+            }
+
+    def stop(self):
+        self._queue.put(None)
+        self._thread.join()
+
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+# Process-wide batcher per model path, shared by every Streamlit session
+def get_batcher(model_path=None):
+    batcher = _batchers.get(model_path)
+    if batcher is None:
+        with _batchers_lock:
+            batcher = _batchers.get(model_path)
+            if batcher is None:
+                batcher = MicroBatcher(model_path)
+                _batchers[model_path] = batcher
+    return batcher
+
+
+# Synthetic load generator: many concurrent clients sending random 128x128 images
+def run_load(batcher, clients, requests_per_client):
+    def client(seed):
+        rng = np.random.default_rng(seed)
+        latencies = []
+        for _ in range(requests_per_client):
+            image_array = rng.uniform(0, 255, model_registry.INPUT_SHAPE).astype(np.float32)
+            started = time.perf_counter()
+            batcher.submit(image_array).result()
+            latencies.append(time.perf_counter() - started)
+        return latencies
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        latencies = [latency for result in pool.map(client, range(clients)) for latency in result]
+    elapsed = time.perf_counter() - started
+    latencies_ms = np.array(latencies) * 1000.0
+    return {
+        "clients": clients,
+        "images": len(latencies),
+        "images_per_sec": len(latencies) / elapsed,
+        "latency_ms_p50": float(np.percentile(latencies_ms, 50)),
+        "latency_ms_p95": float(np.percentile(latencies_ms, 95)),
+        "latency_ms_p99": float(np.percentile(latencies_ms, 99)),
+        "batcher": batcher.metrics(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drive the micro-batching inference server with synthetic load.")
+    parser.add_argument("--model", default=model_registry.DEFAULT_MODEL_PATH)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=50, help="requests per client")
+    parser.add_argument("--max-batch-size", type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS)
+    args = parser.parse_args()
+
+    model_registry.warm_up([args.model])
+    batcher = MicroBatcher(args.model, args.max_batch_size, args.max_wait_ms)
+    print(json.dumps(run_load(batcher, args.clients, args.requests), indent=2))
+    batcher.stop()
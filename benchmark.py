@@ -0,0 +1,131 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime
+import numpy as np
+
+DEFAULT_MODELS = ["trained_plant_disease_model.h5", "trained_plant_disease_model.keras",
+                  "trained_plant_disease_model", "plant_disease_model.tflite"]
+
+
+def _percentiles(seconds):
+    ms = np.array(seconds) * 1000.0
+    return {"p50_ms": float(np.percentile(ms, 50)), "p95_ms": float(np.percentile(ms, 95)),
+            "p99_ms": float(np.percentile(ms, 99)), "mean_ms": float(ms.mean())}
+
+
+def _peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+# One (model, threads) configuration, run in a fresh process so load times are truly cold
+def run_worker(model_path, threads, batch_sizes, iterations, images_dir, max_images):
+    os.environ["PLANT_TFLITE_THREADS"] = str(threads)
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    import model_registry
+    import inference
+    import image_ingest
+
+    result = {"model": model_path, "threads": threads, "batches": []}
+    started = time.perf_counter()
+    model = model_registry.get_model(model_path)
+    result["cold_load_s"] = time.perf_counter() - started
+    started = time.perf_counter()
+    model.predict_on_batch(np.zeros((1,) + model_registry.INPUT_SHAPE, dtype=np.float32))
+    result["cold_first_predict_s"] = time.perf_counter() - started
+
+    rng = np.random.default_rng(0)
+    uploads = image_ingest.list_images(images_dir)[:max_images]
+    for batch_size in batch_sizes:
+        synthetic = rng.uniform(0, 255, (batch_size,) + model_registry.INPUT_SHAPE).astype(np.float32)
+        model.predict_on_batch(synthetic)  # Warm this batch shape
+        latencies = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            model.predict_on_batch(synthetic)
+            latencies.append(time.perf_counter() - started)
+        entry = {"batch_size": batch_size, "synthetic": _percentiles(latencies)}
+        entry["synthetic"]["images_per_sec"] = batch_size / float(np.mean(latencies))
+
+        # Real uploads through predict_batch, decode and resize included
+        if uploads:
+            sample = [uploads[i % len(uploads)] for i in range(batch_size)]
+            latencies = []
+            for _ in range(max(1, iterations // 4)):
+                started = time.perf_counter()
+                inference.predict_batch(sample, batch_size, model)
+                latencies.append(time.perf_counter() - started)
+            entry["uploads"] = _percentiles(latencies)
+            entry["uploads"]["images_per_sec"] = batch_size / float(np.mean(latencies))
+        result["batches"].append(entry)
+    result["peak_rss_mb"] = _peak_rss_mb()
+    return result
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Run every configuration in its own subprocess and collect one JSON report
+def run_suite(models, thread_counts, batch_sizes, iterations, images_dir, max_images):
+    report = {
+        "commit": _git_commit(),
+        "timestamp": str(datetime.now()),
+        "host": {"machine": platform.machine(), "python": platform.python_version(), "cpu_count": os.cpu_count()},
+        "config": {"batch_sizes": batch_sizes, "threads": thread_counts, "iterations": iterations,
+                   "images_dir": images_dir, "max_images": max_images},
+        "results": [],
+    }
+    for model_path in models:
+        if not os.path.exists(model_path):
+            print(f"skipping {model_path}: not found", file=sys.stderr)
+            continue
+        for threads in thread_counts:
+            command = [sys.executable, os.path.abspath(__file__), "--worker", "--models", model_path,
+                       "--threads", str(threads), "--batch-sizes", ",".join(map(str, batch_sizes)),
+                       "--iterations", str(iterations), "--images-dir", images_dir, "--max-images", str(max_images)]
+            completed = subprocess.run(command, capture_output=True, text=True,
+                                       env=dict(os.environ, CUDA_VISIBLE_DEVICES="-1", TF_CPP_MIN_LOG_LEVEL="2"))
+            if completed.returncode != 0:
+                report["results"].append({"model": model_path, "threads": threads,
+                                          "error": completed.stderr.strip().splitlines()[-1:]})
+                continue
+            report["results"].append(json.loads(completed.stdout.strip().splitlines()[-1]))
+            print(f"done {model_path} threads={threads}", file=sys.stderr)
+    return report
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(",") if v]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CPU inference benchmark: latency percentiles, throughput and peak RSS.")
+    parser.add_argument("--models", nargs="+", default=DEFAULT_MODELS)
+    parser.add_argument("--batch-sizes", type=_int_list, default=[1, 8, 32])
+    parser.add_argument("--threads", type=_int_list, default=sorted({1, os.cpu_count() or 1}))
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--images-dir", default="uploaded_images")
+    parser.add_argument("--max-images", type=int, default=64)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.models[0], args.threads[0], args.batch_sizes, args.iterations,
+                                    args.images_dir, args.max_images)))
+    else:
+        report = run_suite(args.models, args.threads, args.batch_sizes, args.iterations, args.images_dir, args.max_images)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(args.output)
@@ -0,0 +1,108 @@
+import argparse
+import json
+import os
+import numpy as np
+from PIL import Image
+import model_registry
+import inference
+import image_ingest
+import image_decode
+import class_metadata
+
+TOP_K = 3
+# Leaf gate: share of plant-coloured pixels needed, and share of blank (white / flat) background allowed
+MIN_PLANT_FRACTION = float(os.environ.get("PLANT_MIN_PLANT_FRACTION", "0.15"))
+MAX_BLANK_FRACTION = float(os.environ.get("PLANT_MAX_BLANK_FRACTION", "0.5"))
+# Below this calibrated top-1 probability the answer is shown as uncertain
+MIN_CONFIDENCE = float(os.environ.get("PLANT_MIN_CONFIDENCE", "0.5"))
+
+
+# Cheap colour check on the 128x128 model input, run before the CNN
+def leaf_check(image_array):
+    hsv = np.asarray(Image.fromarray(np.asarray(image_array, dtype=np.uint8)).convert("HSV"), dtype=np.float32)
+    hue, saturation, value = hsv[..., 0] * (360.0 / 255.0), hsv[..., 1] / 255.0, hsv[..., 2] / 255.0
+    lit = value >= 0.15
+    green_to_yellow = (hue >= 20) & (hue <= 170) & (saturation >= 0.2) & lit
+    brown_lesion = ((hue < 20) | (hue > 330)) & (saturation >= 0.25) & lit & (value <= 0.8)
+    blank = (saturation < 0.08) & (value > 0.9)
+    plant_fraction = float(np.mean(green_to_yellow | brown_lesion))
+    blank_fraction = float(np.mean(blank))
+    if plant_fraction < MIN_PLANT_FRACTION:
+        return False, f"only {plant_fraction:.0%} of the image looks like leaf tissue"
+    if blank_fraction > MAX_BLANK_FRACTION:
+        return False, f"{blank_fraction:.0%} of the image is blank background, not a field photo"
+    return True, None
+
+
+# Temperature scaling on the model's softmax output (log-probabilities act as logits)
+def calibrate(probabilities, temperature):
+    logits = np.log(np.clip(np.asarray(probabilities, dtype=np.float64), 1e-12, 1.0)) / temperature
+    logits -= logits.max(axis=-1, keepdims=True)
+    scaled = np.exp(logits)
+    return (scaled / scaled.sum(axis=-1, keepdims=True)).astype(np.float32)
+
+
+# [(class index, calibrated probability), ...] best first
+def top_k(probabilities, k=TOP_K, temperature=1.0):
+    calibrated = calibrate(probabilities, temperature)
+    best = np.argsort(calibrated)[::-1][:k]
+    return [(int(index), float(calibrated[index])) for index in best]
+
+
+# Temperature minimising negative log-likelihood on labelled validation predictions
+def fit_temperature(probabilities, true_indices):
+    true_indices = np.asarray(true_indices)
+
+    def nll(temperature):
+        calibrated = calibrate(probabilities, temperature)
+        return -float(np.mean(np.log(np.clip(calibrated[np.arange(len(true_indices)), true_indices], 1e-12, 1.0))))
+
+    candidates = np.logspace(np.log10(0.25), np.log10(10.0), 60)
+    best = min(candidates, key=nll)
+    for _ in range(3):
+        candidates = np.linspace(best * 0.85, best * 1.15, 31)
+        best = min(candidates, key=nll)
+    return float(best)
+
+
+# Labelled images in a PlantVillage-style directory: one sub-directory per class label
+def labelled_images(images_dir, class_table):
+    paths, indices = [], []
+    for label in sorted(os.listdir(images_dir)):
+        index = class_table.index_of(label)
+        if index is None or not os.path.isdir(os.path.join(images_dir, label)):
+            continue
+        for path in image_ingest.list_images(os.path.join(images_dir, label)):
+            paths.append(path)
+            indices.append(index)
+    return paths, indices
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit the softmax temperature and try the leaf gate.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    fit_parser = subparsers.add_parser("fit", help="fit the temperature on a labelled validation directory")
+    fit_parser.add_argument("--images-dir", default="valid")
+    fit_parser.add_argument("--model", default=model_registry.DEFAULT_MODEL_PATH)
+    fit_parser.add_argument("--metadata", default=class_metadata.METADATA_PATH)
+    gate_parser = subparsers.add_parser("gate", help="show which images the leaf gate would reject")
+    gate_parser.add_argument("--images-dir", default=image_ingest.UPLOAD_DIR)
+    args = parser.parse_args()
+
+    if args.command == "fit":
+        class_table = class_metadata.get_model_table(args.model)
+        paths, indices = labelled_images(args.images_dir, class_table)
+        probabilities = inference.predict_batch(paths, model=model_registry.get_model(args.model))
+        temperature = fit_temperature(probabilities, indices)
+        with open(args.metadata, 'r', encoding='utf-8') as f:
+            document = json.load(f)
+        document["calibration"] = {"temperature": round(temperature, 4), "images": len(paths),
+                                   "model": model_registry.artifact_version(args.model)}
+        with open(args.metadata, 'w', encoding='utf-8') as f:
+            json.dump(document, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"temperature={temperature:.4f} fitted on {len(paths)} images")
+    else:
+        for path in image_ingest.list_images(args.images_dir):
+            accepted, reason = leaf_check(image_decode.decode_into(path))
+            print(f"{'accept' if accepted else 'reject'}  {path}" + (f"  ({reason})" if reason else ""))
@@ -0,0 +1,113 @@
+import json
+import os
+import threading
+import fileio
+
+# Versioned label table that ships next to the model artifacts
+METADATA_PATH = os.environ.get("PLANT_CLASS_METADATA", "class_metadata.json")
+# Keys of the result dict shown on the recognition page and stored with each submission
+RESULT_KEYS = ("রোগ", "কেন হয়", "প্রতিকার")
+
+
+# Index-addressed class table: one tuple per field, row i is softmax output i
+class ClassTable:
+    def __init__(self, document, path=None):
+        classes = sorted(document["classes"], key=lambda c: c["index"])
+        if [c["index"] for c in classes] != list(range(len(classes))):
+            raise ValueError(f"{path}: class indices must be 0..{len(classes) - 1} without gaps")
+        self.path = path
+        self._document = document
+        self.version = document["version"]
+        self.temperature = float(document.get("calibration", {}).get("temperature", 1.0))
+        self.labels = tuple(c["label"] for c in classes)
+        self.languages = tuple(sorted({language for c in classes for language in c["name"]}))
+        self.names = {language: tuple(c["name"].get(language, c["label"]) for c in classes) for language in self.languages}
+        self.causes = {language: tuple(c.get("cause", {}).get(language, "") for c in classes) for language in self.languages}
+        self.remedies = {language: tuple(c.get("remedy", {}).get(language, "") for c in classes) for language in self.languages}
+        # Any label or localized name (as logged by older versions) back to its index
+        self._lookup = {}
+        for index, c in enumerate(classes):
+            for key in [c["label"]] + list(c["name"].values()):
+                self._lookup.setdefault(key.strip(), index)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def index_of(self, label_or_name):
+        if label_or_name is None:
+            return None
+        return self._lookup.get(label_or_name.strip())
+
+    # Result dict for the page and the submission log
+    def result(self, index, language="bn"):
+        name_key, cause_key, remedy_key = RESULT_KEYS
+        return {
+            "label": self.labels[index],
+            name_key: self.names[language][index],
+            cause_key: self.causes[language][index],
+            remedy_key: self.remedies[language][index],
+        }
+
+    # Same names and remedies, restricted to and ordered like one model's outputs
+    def subset(self, labels, path=None):
+        missing = [label for label in labels if self.index_of(label) is None]
+        if missing:
+            raise ValueError(f"{path}: labels not in {self.path}: {', '.join(missing)}")
+        classes = {c["label"]: c for c in self._document["classes"]}
+        document = dict(self._document,
+                        classes=[dict(classes[self.labels[self.index_of(label)]], index=i) for i, label in enumerate(labels)])
+        return ClassTable(document, path or self.path)
+
+    # The model's softmax width must match the label count, otherwise indices point at the wrong disease
+    def check_output_width(self, width, model_name="model"):
+        if width != len(self.labels):
+            raise ValueError(f"{model_name} has {width} output units but {self.path} (version {self.version}) "
+                             f"lists {len(self.labels)} classes")
+
+
+_tables = {}
+_model_tables = {}
+_tables_lock = threading.Lock()
+
+
+# Output order of one model artifact, stored next to it; artifacts without one use the full table
+def labels_path_for(model_path):
+    return os.path.normpath(model_path) + ".labels.json"
+
+
+def write_labels(model_path, labels):
+    document = json.dumps({"labels": list(labels)}, indent=2) + "\n"
+    fileio.write_atomic(labels_path_for(model_path), lambda f: f.write(document), 'w', encoding='utf-8')
+
+
+# Parsed once per process and path
+def get_class_table(path=None):
+    path = path or METADATA_PATH
+    table = _tables.get(path)
+    if table is None:
+        with _tables_lock:
+            table = _tables.get(path)
+            if table is None:
+                with open(path, 'r', encoding='utf-8') as f:
+                    table = ClassTable(json.load(f), path)
+                _tables[path] = table
+    return table
+
+
+# Class table of one model artifact: row i is that model's softmax output i.
+# table_indices maps each output to its row in the shared table, so results can be compared across models.
+def get_model_table(model_path):
+    labels_path = labels_path_for(model_path)
+    key = (labels_path, os.path.getmtime(labels_path) if os.path.exists(labels_path) else None)
+    table = _model_tables.get(key)
+    if table is None:
+        shared = get_class_table()
+        if key[1] is None:
+            table = shared
+        else:
+            with open(labels_path, 'r', encoding='utf-8') as f:
+                table = shared.subset(json.load(f)["labels"], labels_path)
+        table.table_indices = tuple(shared.index_of(label) for label in table.labels)
+        with _tables_lock:
+            _model_tables[key] = table
+    return table
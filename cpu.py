@@ -0,0 +1,13 @@
+import os
+
+
+# Cores this process may run on (its affinity mask), sorted
+def available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+# Default worker/thread count for data pipelines
+def core_count():
+    return len(available_cores())
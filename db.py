@@ -0,0 +1,29 @@
+import sqlite3
+import threading
+
+# One SQLite connection per thread, database file and caller; Streamlit runs each session on its own thread
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized = set()
+
+
+# WAL-mode connection of this thread; init(conn) runs once per process and database file, on the first connection.
+# isolation_level=None leaves transactions to the caller (BEGIN IMMEDIATE), the default opens them implicitly.
+def connect(db_path, init=None, isolation_level=""):
+    key = (db_path, init, isolation_level)
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(key)
+    if conn is None:
+        conn = sqlite3.connect(db_path, timeout=30, isolation_level=isolation_level)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        connections[key] = conn
+        with _init_lock:
+            if (db_path, init) not in _initialized:
+                if init is not None:
+                    init(conn)
+                _initialized.add((db_path, init))
+    return conn
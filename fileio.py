@@ -0,0 +1,24 @@
+import os
+import threading
+from contextlib import contextmanager
+
+
+# Temporary path next to path for an atomic write, unique per process and thread; on success it replaces path,
+# so readers see the old or the new file and never a partial one
+@contextmanager
+def atomic_path(path):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+# Atomically replace path with whatever write(f) writes to the open temporary file
+def write_atomic(path, write, mode="wb", encoding=None):
+    with atomic_path(path) as tmp_path:
+        with open(tmp_path, mode, encoding=encoding) as f:
+            write(f)
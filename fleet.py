@@ -0,0 +1,165 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+import cpu
+
+# Deployment mode: several prediction worker processes on one machine, each pinned to its own cores.
+# With a .tflite model every process maps the same flatbuffer read-only, so the weights sit in the page cache once.
+DEFAULT_MODEL = os.environ.get("PLANT_FLEET_MODEL", "plant_disease_model.tflite")
+
+
+# Split the cores evenly between workers, workers beyond the core count share round-robin
+def plan_cores(workers, cores=None):
+    cores = cores or cpu.available_cores()
+    if workers >= len(cores):
+        return [[cores[i % len(cores)]] for i in range(workers)]
+    per_worker = len(cores) // workers
+    return [cores[i * per_worker:(i + 1) * per_worker] for i in range(workers)]
+
+
+# Pin this process and size its thread pools to its cores; must run before tensorflow is imported
+def configure_worker(cores, inter_op_threads=1):
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    threads = str(len(cores))
+    os.environ["PLANT_TFLITE_THREADS"] = threads
+    os.environ["TF_NUM_INTRAOP_THREADS"] = threads
+    os.environ["TF_NUM_INTEROP_THREADS"] = str(inter_op_threads)
+    os.environ["OMP_NUM_THREADS"] = threads
+    os.environ.setdefault("CUDA_VISIBLE_DEVICES", "-1")
+    os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(len(cores))
+    tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+
+
+# Resident memory of this process split into shared and private pages (kB), from /proc/self/smaps_rollup
+def memory_kb():
+    memory = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty"):
+                    memory[key.lower()] = int(value.split()[0])
+    except OSError:
+        pass
+    return memory
+
+
+# Queue worker process: one model instance, one queue thread, micro-batched through batching_server
+def _serve(model_path, cores):
+    configure_worker(cores)
+    os.environ["PLANT_MODEL_PATH"] = model_path
+    import model_registry
+    import metrics
+    import prediction_jobs
+    model_registry.warm_up([model_path])
+    prediction_jobs.get_pool(1)
+    while True:
+        time.sleep(60)
+        metrics.write_stats_file()
+
+
+# Start the worker processes and wait for them; run the app with PLANT_ASYNC_PREDICTIONS=1 PLANT_QUEUE_WORKERS=0
+def serve(workers, model_path=DEFAULT_MODEL):
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=_serve, args=(model_path, cores), name=f"prediction-worker-{i}", daemon=True)
+                 for i, cores in enumerate(plan_cores(workers))]
+    for process, cores in zip(processes, plan_cores(workers)):
+        process.start()
+        print(f"{process.name} pid={process.pid} cores={cores}", file=sys.stderr)
+    for process in processes:
+        process.join()
+
+
+# Load-test worker: predict synthetic batches as fast as possible for a fixed time after the start barrier
+def _load_worker(model_path, cores, batch_size, seconds, barrier, results):
+    configure_worker(cores)
+    import numpy as np
+    import model_registry
+    model = model_registry.get_model(model_path)
+    batch = np.random.default_rng(len(cores)).uniform(0, 255, (batch_size,) + model_registry.INPUT_SHAPE).astype(np.float32)
+    model.predict_on_batch(batch)
+    barrier.wait()
+    images, started = 0, time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        model.predict_on_batch(batch)
+        images += batch_size
+    results.put({"cores": cores, "images": images, "seconds": time.perf_counter() - started, "memory_kb": memory_kb()})
+
+
+# Throughput for each worker count, one single-threaded process per core up to the core count
+def load_test(model_path, worker_counts, batch_size=8, seconds=10.0):
+    context = multiprocessing.get_context("spawn")
+    report = {
+        "timestamp": str(datetime.now()),
+        "host": {"machine": platform.machine(), "python": platform.python_version(), "cores": len(cpu.available_cores())},
+        "config": {"model": model_path, "batch_size": batch_size, "seconds": seconds,
+                   "shared_weights": os.environ.get("PLANT_TFLITE_SHARED_WEIGHTS", "0") == "1"},
+        "results": [],
+    }
+    baseline = None
+    for workers in worker_counts:
+        plan = plan_cores(workers, cpu.available_cores()[:workers])
+        barrier, results = context.Barrier(workers), context.Queue()
+        processes = [context.Process(target=_load_worker, args=(model_path, cores, batch_size, seconds, barrier, results))
+                     for cores in plan]
+        for process in processes:
+            process.start()
+        outcomes = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        images_per_sec = sum(outcome["images"] / outcome["seconds"] for outcome in outcomes)
+        baseline = baseline or images_per_sec / workers
+        report["results"].append({
+            "workers": workers,
+            "threads_per_worker": len(plan[0]),
+            "images_per_sec": images_per_sec,
+            "speedup": images_per_sec / baseline,
+            "efficiency": images_per_sec / (baseline * workers),
+            "rss_mb_per_worker": [outcome["memory_kb"].get("rss", 0) / 1024.0 for outcome in outcomes],
+            "private_dirty_mb_per_worker": [outcome["memory_kb"].get("private_dirty", 0) / 1024.0 for outcome in outcomes],
+            "pss_mb_total": sum(outcome["memory_kb"].get("pss", 0) for outcome in outcomes) / 1024.0,
+        })
+        print(f"workers={workers} images/sec={images_per_sec:.1f}", file=sys.stderr)
+    return report
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(",") if v]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run several pinned prediction worker processes, or load-test their scaling.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve_parser = subparsers.add_parser("serve", help="serve the prediction queue from several processes")
+    serve_parser.add_argument("--workers", type=int, default=len(cpu.available_cores()))
+    serve_parser.add_argument("--model", default=DEFAULT_MODEL)
+    serve_parser.add_argument("--shared-weights", action="store_true", help="builtin TFLite kernels on the shared mapping, no XNNPACK copy")
+    test_parser = subparsers.add_parser("load-test", help="throughput for 1..N single-core worker processes")
+    test_parser.add_argument("--model", default=DEFAULT_MODEL)
+    test_parser.add_argument("--workers", type=_int_list,
+                             default=[n for n in (1, 2, 4, 8, 16, 32) if n < len(cpu.available_cores())] + [len(cpu.available_cores())])
+    test_parser.add_argument("--batch-size", type=int, default=8)
+    test_parser.add_argument("--seconds", type=float, default=10.0)
+    test_parser.add_argument("--output", default="fleet_load_test.json")
+    test_parser.add_argument("--shared-weights", action="store_true", help="builtin TFLite kernels on the shared mapping, no XNNPACK copy")
+    args = parser.parse_args()
+
+    # Inherited by the spawned worker processes
+    if args.shared_weights:
+        os.environ["PLANT_TFLITE_SHARED_WEIGHTS"] = "1"
+
+    if args.command == "serve":
+        serve(args.workers, args.model)
+    else:
+        report = load_test(args.model, args.workers, args.batch_size, args.seconds)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(args.output)
@@ -0,0 +1,115 @@
+import argparse
+import io
+import os
+import sys
+import threading
+import numpy as np
+from PIL import Image
+import model_registry
+
+IMAGE_SIZE = model_registry.INPUT_SHAPE[:2]
+# JPEGs are decoded at the smallest DCT scale (1/2, 1/4, 1/8) that still covers this size;
+# 4x the model input keeps nearest-neighbour sampling within ~1 grey level of a full decode
+DRAFT_SIZE = (IMAGE_SIZE[1] * 4, IMAGE_SIZE[0] * 4)
+# Larger images are refused before any pixel is decoded (header size, i.e. before draft)
+MAX_PIXELS = int(os.environ.get("PLANT_MAX_IMAGE_PIXELS", str(64 * 1000 * 1000)))
+# Formats without reduced-resolution decode (PNG, WebP, ...) are held fully in memory, so they get a lower cap
+MAX_FULL_DECODE_PIXELS = int(os.environ.get("PLANT_MAX_FULL_DECODE_PIXELS", str(16 * 1000 * 1000)))
+
+# EXIF orientation tag value -> transpose that puts the image upright, as in ImageOps.exif_transpose
+ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+_local = threading.local()
+
+
+# Reusable 128x128x3 float32 buffer, one per thread
+def thread_buffer():
+    buffer = getattr(_local, "buffer", None)
+    if buffer is None:
+        buffer = _local.buffer = np.empty(model_registry.INPUT_SHAPE, dtype=np.float32)
+    return buffer
+
+
+def _open(source):
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    elif hasattr(source, "getvalue") and not isinstance(source, io.BytesIO):
+        source = io.BytesIO(source.getvalue())
+    return Image.open(source)
+
+
+def orientation(image):
+    return image.getexif().get(0x0112, 1)
+
+
+# Decode one image (file path, raw bytes or file-like buffer) at reduced resolution, upright,
+# and write the 128x128 RGB model input into out (the calling thread's buffer when out is None)
+def decode_into(source, out=None):
+    out = thread_buffer() if out is None else out
+    with _open(source) as image:
+        width, height = image.size
+        if width * height > MAX_PIXELS:
+            raise ValueError(f"image is {width}x{height}, more than {MAX_PIXELS} pixels")
+        image.draft("RGB", DRAFT_SIZE)
+        if image.size[0] * image.size[1] > MAX_FULL_DECODE_PIXELS:
+            raise ValueError(f"{image.format} image is {width}x{height}, more than {MAX_FULL_DECODE_PIXELS} "
+                             f"pixels without reduced-resolution decode")
+        transpose = ORIENTATION_TRANSPOSE.get(orientation(image))
+        resized = image.convert("RGB").resize((IMAGE_SIZE[1], IMAGE_SIZE[0]), Image.NEAREST)
+    if transpose is not None:
+        resized = resized.transpose(transpose)
+    np.copyto(out, np.asarray(resized), casting="unsafe")
+    return out
+
+
+# Reference input from the previous keras load_img path, turned upright the same way
+def load_img_reference(path):
+    import tensorflow as tf
+    image = tf.keras.preprocessing.image.load_img(path, target_size=IMAGE_SIZE)
+    with Image.open(path) as original:
+        transpose = ORIENTATION_TRANSPOSE.get(orientation(original))
+    if transpose is not None:
+        image = image.transpose(transpose)
+    return np.asarray(image, dtype=np.float32)
+
+
+# Compare decode_into against load_img on real images: mean and max absolute difference per image
+def parity_check(image_paths, tolerance=2.0):
+    report = {"images": 0, "failures": [], "max_mean_abs_diff": 0.0, "tolerance": tolerance}
+    buffer = np.empty(model_registry.INPUT_SHAPE, dtype=np.float32)
+    for path in image_paths:
+        try:
+            reference = load_img_reference(path)
+            decode_into(path, buffer)
+        except (OSError, ValueError) as e:
+            report["failures"].append({"path": path, "error": str(e)})
+            continue
+        difference = np.abs(buffer - reference)
+        mean_abs_diff = float(difference.mean())
+        report["images"] += 1
+        report["max_mean_abs_diff"] = max(report["max_mean_abs_diff"], mean_abs_diff)
+        if mean_abs_diff > tolerance:
+            report["failures"].append({"path": path, "mean_abs_diff": mean_abs_diff,
+                                       "max_abs_diff": float(difference.max())})
+    return report
+
+
+if __name__ == "__main__":
+    import json
+    import image_ingest
+    parser = argparse.ArgumentParser(description="Check reduced-resolution decode against the keras load_img path.")
+    parser.add_argument("--images-dir", default=image_ingest.UPLOAD_DIR)
+    parser.add_argument("--tolerance", type=float, default=2.0, help="allowed mean absolute difference (0-255 scale)")
+    args = parser.parse_args()
+
+    report = parity_check(image_ingest.list_images(args.images_dir), args.tolerance)
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if report["failures"] or not report["images"] else 0)
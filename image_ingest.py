@@ -0,0 +1,88 @@
+import hashlib
+import io
+import os
+from collections import namedtuple
+import numpy as np
+from PIL import Image
+import thumbnails
+import fileio
+import image_decode
+import metrics
+
+UPLOAD_DIR = "uploaded_images"
+TENSOR_DIR = os.path.join(UPLOAD_DIR, ".tensors")
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".gif", ".webp"}
+
+# Everything derived from one upload, all named after the sha256 of its bytes
+Artifacts = namedtuple("Artifacts", ["digest", "name", "original_path", "tensor_path", "thumbnail_path"])
+
+
+# Raised by ingest_bytes when check() refuses the decoded image, nothing is stored for it
+class Rejected(ValueError):
+    pass
+
+
+# Every image in the archive, skipping the derived .tensors/.thumbnails folders
+def list_images(images_dir=UPLOAD_DIR):
+    paths = []
+    for root, dirs, files in os.walk(images_dir):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                paths.append(os.path.normpath(os.path.join(root, name)))
+    return paths
+
+
+def tensor_path_for(digest):
+    return os.path.join(TENSOR_DIR, f"{digest}.npy")
+
+
+# Decode an upload once (at reduced resolution) and store the original, the 128x128 tensor and a display thumbnail.
+# check(tensor) -> (accepted, reason) runs on the decoded tensor before anything is written.
+def ingest_bytes(data, name="upload.jpg", check=None):
+    digest = hashlib.sha256(data).hexdigest()
+    extension = os.path.splitext(name)[1].lower() or ".jpg"
+    original_path = os.path.join(UPLOAD_DIR, f"{digest}{extension}")
+    tensor_path = tensor_path_for(digest)
+    thumbnail_path = thumbnails.content_thumbnail_path(digest)
+    for directory in (UPLOAD_DIR, TENSOR_DIR, thumbnails.THUMBNAIL_DIR):
+        os.makedirs(directory, exist_ok=True)
+
+    # Decode first so images over the pixel caps, or refused by check, are never written
+    tensor = None
+    if not os.path.exists(tensor_path):
+        with metrics.stage("decode_resize"):
+            tensor = image_decode.decode_into(data)
+    if check is not None:
+        with metrics.stage("leaf_gate"):
+            accepted, reason = check(tensor if tensor is not None else np.load(tensor_path, mmap_mode="r"))
+        if not accepted:
+            raise Rejected(reason)
+    if tensor is not None:
+        fileio.write_atomic(tensor_path, lambda f: np.save(f, tensor))
+    if not os.path.exists(original_path):
+        fileio.write_atomic(original_path, lambda f: f.write(data))
+    if not os.path.exists(thumbnail_path):
+        with metrics.stage("thumbnail"):
+            with Image.open(io.BytesIO(data)) as image:
+                image.draft("RGB", thumbnails.THUMBNAIL_SIZE)
+                thumbnails.save_thumbnail(image, thumbnail_path)
+    return Artifacts(digest, name, original_path, tensor_path, thumbnail_path)
+
+
+# Remove an upload together with its stored tensor and thumbnails
+def delete_upload(image_path):
+    digest = os.path.splitext(os.path.basename(image_path))[0]
+    for path in thumbnails.thumbnail_paths(image_path) + [tensor_path_for(digest), image_path]:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+# Ingest a Streamlit UploadedFile
+def ingest_upload(uploaded_file, check=None):
+    return ingest_bytes(uploaded_file.getvalue(), uploaded_file.name, check)
+
+
+# Memory-mapped 128x128x3 model input of an ingested image
+def load_tensor(artifacts):
+    return np.load(artifacts.tensor_path, mmap_mode="r")
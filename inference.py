@@ -0,0 +1,29 @@
+import numpy as np
+import model_registry
+import image_decode
+import metrics
+
+IMAGE_SIZE = model_registry.INPUT_SHAPE[:2]
+DEFAULT_BATCH_SIZE = 32
+
+
+# Decode one image (file path, raw bytes or file-like buffer) and resize it into out
+def load_image_into(source, out):
+    with metrics.stage("decode_resize"):
+        return image_decode.decode_into(source, out)
+
+
+# Run the model over many images, one predict call per chunk of batch_size
+def predict_batch(sources, batch_size=DEFAULT_BATCH_SIZE, model=None):
+    sources = list(sources)
+    model = model or model_registry.get_model()
+    if not sources:
+        return np.empty((0, model.output_shape[-1]), dtype=np.float32)
+    batch = np.empty((min(batch_size, len(sources)),) + model_registry.INPUT_SHAPE, dtype=np.float32)
+    predictions = []
+    for start in range(0, len(sources), batch_size):
+        chunk = sources[start:start + batch_size]
+        for i, source in enumerate(chunk):
+            load_image_into(source, batch[i])
+        predictions.append(np.asarray(model.predict_on_batch(batch[:len(chunk)])))
+    return np.concatenate(predictions)
@@ -0,0 +1,336 @@
+import argparse
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+import db
+import metrics
+
+# Persistent local job queue: one SQLite file, shared by every Streamlit session and worker process
+QUEUE_DB = os.environ.get("PLANT_QUEUE_DB", "jobs.db")
+# Queued + running jobs allowed at once, enqueue beyond this raises QueueFull (backpressure)
+MAX_DEPTH = int(os.environ.get("PLANT_QUEUE_MAX_DEPTH", "256"))
+MAX_ATTEMPTS = int(os.environ.get("PLANT_QUEUE_MAX_ATTEMPTS", "3"))
+RETRY_DELAY_SECONDS = 2.0
+# A running job whose worker died is handed out again once its lease runs out;
+# a live worker renews the lease every LEASE_SECONDS / 4 while its handler runs
+LEASE_SECONDS = 120.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    lease_until REAL,
+    worker TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (kind, status, available_at);
+"""
+
+
+class QueueFull(Exception):
+    pass
+
+
+def _init(conn):
+    conn.executescript(SCHEMA)
+
+
+# Transactions are opened explicitly
+def _connect(db_path=None):
+    return db.connect(db_path or QUEUE_DB, _init, isolation_level=None)
+
+
+# Write transaction that takes the database lock up front, so a depth check and its insert cannot interleave
+@contextmanager
+def _transaction(db_path=None):
+    conn = _connect(db_path)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def _row_to_dict(row):
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+    return job
+
+
+# Add one job per payload, all or nothing; raises QueueFull when the queue is at MAX_DEPTH
+def enqueue(kind, payloads, max_depth=None, db_path=None):
+    max_depth = max_depth or MAX_DEPTH
+    now = time.time()
+    with _transaction(db_path) as conn:
+        depth = conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')").fetchone()[0]
+        if depth + len(payloads) > max_depth:
+            metrics.inc("queue_rejected_total", len(payloads))
+            raise QueueFull(f"{depth} jobs waiting, the limit is {max_depth}")
+        ids = [conn.execute(
+            "INSERT INTO jobs (kind, payload, status, available_at, created, updated) VALUES (?, ?, 'queued', ?, ?, ?)",
+            (kind, json.dumps(payload, ensure_ascii=False), now, now, now)).lastrowid for payload in payloads]
+    metrics.inc("queue_enqueued_total", len(ids))
+    return ids
+
+
+# Hand up to limit due jobs of one kind to a worker, oldest first
+def claim(kind, limit, worker, db_path=None):
+    now = time.time()
+    with _transaction(db_path) as conn:
+        conn.execute("UPDATE jobs SET status = 'queued', updated = ? WHERE status = 'running' AND lease_until < ?", (now, now))
+        rows = conn.execute("SELECT id FROM jobs WHERE kind = ? AND status = 'queued' AND available_at <= ? ORDER BY id LIMIT ?",
+                            (kind, now, limit)).fetchall()
+        ids = [row[0] for row in rows]
+        if not ids:
+            return []
+        placeholders = ", ".join("?" for _ in ids)
+        conn.execute(f"UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_until = ?, worker = ?, updated = ? "
+                     f"WHERE id IN ({placeholders})", [now + LEASE_SECONDS, worker, now] + ids)
+        rows = conn.execute(f"SELECT * FROM jobs WHERE id IN ({placeholders}) ORDER BY id", ids).fetchall()
+    return [_row_to_dict(row) for row in rows]
+
+
+# Extend the lease of jobs this worker is still running
+def renew(job_ids, worker, db_path=None):
+    job_ids = list(job_ids)
+    placeholders = ", ".join("?" for _ in job_ids)
+    now = time.time()
+    with _transaction(db_path) as conn:
+        conn.execute(f"UPDATE jobs SET lease_until = ?, updated = ? WHERE status = 'running' AND worker = ? AND id IN ({placeholders})",
+                     [now + LEASE_SECONDS, now, worker] + job_ids)
+
+
+def complete(job_id, result, db_path=None):
+    with _transaction(db_path) as conn:
+        conn.execute("UPDATE jobs SET status = 'done', result = ?, error = NULL, lease_until = NULL, updated = ? WHERE id = ?",
+                     (json.dumps(result, ensure_ascii=False), time.time(), job_id))
+    metrics.inc("queue_completed_total")
+
+
+# Retry with exponential backoff until MAX_ATTEMPTS, then park the job as failed; True when it was parked
+def fail(job_id, error, max_attempts=None, db_path=None):
+    max_attempts = max_attempts or MAX_ATTEMPTS
+    now = time.time()
+    with _transaction(db_path) as conn:
+        row = conn.execute("SELECT attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return False
+        if row[0] < max_attempts:
+            conn.execute("UPDATE jobs SET status = 'queued', error = ?, available_at = ?, lease_until = NULL, updated = ? WHERE id = ?",
+                         (error, now + RETRY_DELAY_SECONDS * 2 ** (row[0] - 1), now, job_id))
+            metrics.inc("queue_retried_total")
+            return False
+        conn.execute("UPDATE jobs SET status = 'failed', error = ?, lease_until = NULL, updated = ? WHERE id = ?",
+                     (error, now, job_id))
+    metrics.inc("queue_failed_total")
+    return True
+
+
+# Queued and running jobs of one kind
+def active_jobs(kind, db_path=None):
+    rows = _connect(db_path).execute("SELECT * FROM jobs WHERE kind = ? AND status IN ('queued', 'running')", (kind,)).fetchall()
+    return [_row_to_dict(row) for row in rows]
+
+
+# Current state of the given jobs, for the page to poll
+def get_jobs(job_ids, db_path=None):
+    job_ids = list(job_ids)
+    if not job_ids:
+        return {}
+    placeholders = ", ".join("?" for _ in job_ids)
+    rows = _connect(db_path).execute(f"SELECT * FROM jobs WHERE id IN ({placeholders})", job_ids).fetchall()
+    return {row["id"]: _row_to_dict(row) for row in rows}
+
+
+# Jobs still ahead of job_id in the queue
+def position(job_id, db_path=None):
+    row = _connect(db_path).execute(
+        "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND id < ? AND kind = (SELECT kind FROM jobs WHERE id = ?)",
+        (job_id, job_id)).fetchone()
+    return row[0]
+
+
+def stats(db_path=None):
+    rows = _connect(db_path).execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+    counts = {status: 0 for status in ("queued", "running", "done", "failed")}
+    counts.update({row[0]: row[1] for row in rows})
+    counts["depth"] = counts["queued"] + counts["running"]
+    counts["max_depth"] = MAX_DEPTH
+    return counts
+
+
+# Drop finished jobs older than max_age_seconds, their results already live in the submission log
+def purge(max_age_seconds=24 * 3600, db_path=None):
+    with _transaction(db_path) as conn:
+        return conn.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated < ?",
+                            (time.time() - max_age_seconds,)).rowcount
+
+
+# Threads that claim batches of one kind of job and pass their payloads to handler(payloads) -> results.
+# When a batch raises, its jobs are retried one at a time so only the failing payloads are failed;
+# on_failed(payload) runs for every job that used up its attempts.
+class WorkerPool:
+    def __init__(self, kind, handler, workers=2, batch_size=8, poll_interval=0.5, db_path=None, on_failed=None):
+        self.kind = kind
+        self.handler = handler
+        self.on_failed = on_failed
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.db_path = db_path
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._threads = [threading.Thread(target=self._run, args=(f"{os.getpid()}-{uuid.uuid4().hex[:8]}",),
+                                          name=f"{kind}-worker-{i}", daemon=True) for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    # Wake idle workers right after an enqueue from this process instead of waiting for the next poll
+    def notify(self):
+        self._wake.set()
+
+    def _run(self, worker):
+        while not self._stopped.is_set():
+            jobs = claim(self.kind, self.batch_size, worker, self.db_path)
+            if not jobs:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            for job in jobs:
+                metrics.observe("queue_latency", time.time() - job["created"])
+            with self._lease(jobs, worker):
+                try:
+                    results = self.handler([job["payload"] for job in jobs])
+                except Exception as e:
+                    if len(jobs) == 1:
+                        self._fail(jobs[0], e)
+                    else:
+                        for job in jobs:
+                            self._handle_one(job)
+                    continue
+                for job, result in zip(jobs, results):
+                    complete(job["id"], result, self.db_path)
+
+    def _handle_one(self, job):
+        try:
+            result = self.handler([job["payload"]])[0]
+        except Exception as e:
+            self._fail(job, e)
+            return
+        complete(job["id"], result, self.db_path)
+
+    def _fail(self, job, error):
+        if fail(job["id"], f"{type(error).__name__}: {error}", db_path=self.db_path) and self.on_failed is not None:
+            try:
+                self.on_failed(job["payload"])
+            except Exception:
+                metrics.inc("queue_on_failed_errors_total")  # Cleanup only, the worker keeps running
+
+    # Keep the claimed jobs leased to this worker until the block exits
+    @contextmanager
+    def _lease(self, jobs, worker):
+        done = threading.Event()
+
+        def heartbeat():
+            while not done.wait(LEASE_SECONDS / 4):
+                try:
+                    renew([job["id"] for job in jobs], worker, self.db_path)
+                except sqlite3.Error:
+                    pass  # Try again on the next beat, the lease still has time left
+
+        thread = threading.Thread(target=heartbeat, name=f"{self.kind}-lease", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            done.set()
+            thread.join()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+# One worker pool per job kind and process, shared by every Streamlit session
+def get_pool(kind, handler, workers=2, batch_size=8, on_failed=None):
+    pool = _pools.get(kind)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(kind)
+            if pool is None:
+                pool = _pools[kind] = WorkerPool(kind, handler, workers, batch_size, on_failed=on_failed)
+    return pool
+
+
+# Local stand-in exercise: a flaky echo handler, checks every job finishes despite failures and a bounded queue
+def run_demo(jobs=200, workers=4, failure_rate=0.2, db_path="jobs-demo.db"):
+    global RETRY_DELAY_SECONDS
+    RETRY_DELAY_SECONDS = 0.01
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+
+    def flaky_echo(payloads):
+        if random.random() < failure_rate:
+            raise RuntimeError("injected failure")
+        return [{"echo": payload["n"]} for payload in payloads]
+
+    pool = WorkerPool("demo", flaky_echo, workers=workers, batch_size=4, poll_interval=0.01, db_path=db_path)
+    started = time.perf_counter()
+    ids, rejected = [], 0
+    for n in range(jobs):
+        try:
+            ids.extend(enqueue("demo", [{"n": n}], max_depth=32, db_path=db_path))
+        except QueueFull:
+            rejected += 1
+            time.sleep(0.01)
+    while stats(db_path)["depth"]:
+        time.sleep(0.01)
+    pool.stop()
+    finished = get_jobs(ids, db_path)
+    return {"submitted": len(ids), "rejected_by_backpressure": rejected,
+            "done": sum(job["status"] == "done" for job in finished.values()),
+            "failed": sum(job["status"] == "failed" for job in finished.values()),
+            "retries": sum(job["attempts"] - 1 for job in finished.values()),
+            "correct": all(job["result"] == {"echo": job["payload"]["n"]} for job in finished.values() if job["status"] == "done"),
+            "seconds": time.perf_counter() - started}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect the local job queue or exercise it with a flaky echo handler.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("stats", help="job counts by status")
+    purge_parser = subparsers.add_parser("purge", help="delete finished jobs")
+    purge_parser.add_argument("--max-age-hours", type=float, default=24)
+    demo_parser = subparsers.add_parser("demo", help="run the queue end to end with injected failures")
+    demo_parser.add_argument("--jobs", type=int, default=200)
+    demo_parser.add_argument("--workers", type=int, default=4)
+    demo_parser.add_argument("--failure-rate", type=float, default=0.2)
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        print(json.dumps(stats(), indent=2))
+    elif args.command == "purge":
+        print(f"deleted {purge(args.max_age_hours * 3600)} jobs")
+    else:
+        print(json.dumps(run_demo(args.jobs, args.workers, args.failure_rate), indent=2))
@@ -0,0 +1,155 @@
+import bisect
+import cProfile
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import fileio
+
+PREFIX = "plant"
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRICS_FILE = os.environ.get("PLANT_METRICS_FILE") or None
+PROFILE_DIR = os.environ.get("PLANT_PROFILE_DIR", "profiles")
+
+_lock = threading.Lock()
+_counters = {}
+_stages = {}
+_collectors = {}
+_profiling = os.environ.get("PLANT_PROFILE", "0") == "1"
+
+
+def inc(name, value=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+# Record one duration for a stage: bucket counts, sum and count as in a Prometheus histogram
+def observe(stage_name, seconds):
+    index = bisect.bisect_left(BUCKETS, seconds)
+    with _lock:
+        stage_stats = _stages.get(stage_name)
+        if stage_stats is None:
+            stage_stats = _stages[stage_name] = [[0] * (len(BUCKETS) + 1), 0.0, 0]
+        stage_stats[0][index] += 1
+        stage_stats[1] += seconds
+        stage_stats[2] += 1
+
+
+# Time a block of the request path
+@contextmanager
+def stage(stage_name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage_name, time.perf_counter() - started)
+
+
+# Extra gauges read at render time, e.g. cache or batcher stats
+def register_collector(name, collect):
+    with _lock:
+        _collectors[name] = collect
+
+
+def set_profiling(enabled):
+    global _profiling
+    _profiling = enabled
+
+
+def profiling_enabled():
+    return _profiling
+
+
+# cProfile dump of one request, only when profiling has been switched on
+@contextmanager
+def request_profile(name):
+    if not _profiling:
+        yield None
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profiler.dump_stats(os.path.join(PROFILE_DIR, f"{datetime.now():%Y%m%d-%H%M%S-%f}-{name}.prof"))
+
+
+def _format_labels(labels):
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}" if labels else ""
+
+
+# Prometheus text exposition format
+def render_prometheus():
+    with _lock:
+        counters = dict(_counters)
+        stages = {name: (list(buckets), total, count) for name, (buckets, total, count) in _stages.items()}
+        collectors = dict(_collectors)
+    lines = []
+    for name, value in sorted(counters.items()):
+        lines.append(f"# TYPE {PREFIX}_{name} counter")
+        lines.append(f"{PREFIX}_{name} {value}")
+    if stages:
+        lines.append(f"# TYPE {PREFIX}_stage_seconds histogram")
+    for name, (buckets, total, count) in sorted(stages.items()):
+        cumulative = 0
+        for bound, bucket_count in zip(BUCKETS + (float("inf"),), buckets):
+            cumulative += bucket_count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"{PREFIX}_stage_seconds_bucket{_format_labels({'stage': name, 'le': le})} {cumulative}")
+        lines.append(f"{PREFIX}_stage_seconds_sum{_format_labels({'stage': name})} {total}")
+        lines.append(f"{PREFIX}_stage_seconds_count{_format_labels({'stage': name})} {count}")
+    for collector_name, collect in sorted(collectors.items()):
+        try:
+            values = collect()
+        except Exception:
+            continue
+        for key, value in sorted(values.items()):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines.append(f"# TYPE {PREFIX}_{collector_name}_{key} gauge")
+                lines.append(f"{PREFIX}_{collector_name}_{key} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# Local stats file for scraping with a textfile collector
+def write_stats_file(path=None):
+    path = path or METRICS_FILE
+    if not path:
+        return
+    fileio.write_atomic(path, lambda f: f.write(render_prometheus()), 'w')
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") not in ("", "/metrics"):
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+# /metrics endpoint on a background thread, started once per process
+def start_http_server(port=None, host="127.0.0.1"):
+    global _server
+    port = port or int(os.environ.get("PLANT_METRICS_PORT", "0"))
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+    return _server
@@ -47,7 +47,7 @@ class ImageClassifier(context: Context) {
         arrayOf("স্ট্রবেরি___সুস্থ (গাছটি সুস্থ! 🌱)", "", "গাছকে সুস্থ রাখতে নিয়মিত পানি আলো ও সার দেওয়া উচিত।"),
         arrayOf("মিষ্টি আলু সুস্থ (গাছটি সুস্থ! 🌱)", "---", "গাছকে সুস্থ রাখতে নিয়মিত পানি আলো ও সার দেওয়া উচিত।"),
         arrayOf("টমেটো ব্যাকটেরিয়াল স্পট", "অতিরিক্ত আর্দ্রতা ও সঠিক পরিচর্যার অভাব।", "কপার ছত্রাকনাশক স্প্রে করুন।"),
-        arrayOf("মিষ্টি আলু সুস্থ (গাছটি সুস্থ! 🌱)", "---", "গাছকে সুস্থ রাখতে নিয়মিত পানি আলো ও সার দেওয়া উচিত।"),
+        arrayOf("টমেটো আর্লি ব্লাইট", "উষ্ণ ও আর্দ্র আবহাওয়ায় পুরনো পাতায় ছত্রাক (অল্টারনারিয়া) সংক্রমণ।", "আক্রান্ত পাতা ছেঁটে ফেলুন, ছত্রাকনাশক স্প্রে করুন এবং একই জমিতে পরপর টমেটো চাষ করবেন না।"),
         arrayOf("টমেটো লেট ব্লাইট", "গরম ও আর্দ্র আবহাওয়া।", "রোগমুক্ত জাত ব্যবহার করুন এবং ছত্রাকনাশক স্প্রে করুন।"),
         arrayOf("টমেটো পাতার ছাঁচ", "ঠাণ্ডা ও আর্দ্র আবহাওয়া।", "আক্রান্ত অংশ ছেঁটে ফেলুন এবং ছত্রাকনাশক প্রয়োগ করুন।"),
         arrayOf("টমেটো সেপ্টোরিয়া দাগ", "আর্দ্র আবহাওয়া।", "আক্রান্ত অংশ কেটে ফেলুন এবং ছত্রাকনাশক ব্যবহার করুন।"),
@@ -0,0 +1,85 @@
+import os
+import threading
+import numpy as np
+import tensorflow as tf
+import metrics
+import class_metadata
+
+# Model artifact served by default (.h5, .keras, a SavedModel directory or .tflite)
+DEFAULT_MODEL_PATH = os.environ.get("PLANT_MODEL_PATH", "trained_plant_disease_model.h5")
+INPUT_SHAPE = (128, 128, 3)
+
+# Process-wide registry, shared by every Streamlit session
+_models = {}
+_versions = {}
+_warmed = set()
+_lock = threading.Lock()
+_active_path = DEFAULT_MODEL_PATH
+
+
+# Version string for an artifact, changes whenever the file is replaced
+def artifact_version(path):
+    if not os.path.exists(path):
+        return os.path.basename(os.path.normpath(path))
+    return f"{os.path.basename(os.path.normpath(path))}@{int(os.path.getmtime(path))}"
+
+
+# Load a model artifact from disk, .tflite files get the TFLite interpreter backend
+def _load(path):
+    metrics.inc("model_loads_total")
+    with metrics.stage("load_model"):
+        if path.endswith(".tflite"):
+            import tflite_backend
+            model = tflite_backend.TFLiteModel(path)
+        else:
+            model = tf.keras.models.load_model(path, compile=False)
+    class_metadata.get_model_table(path).check_output_width(model.output_shape[-1], path)
+    return model
+
+
+# Return the model for a path, loading it at most once per process
+def get_model(path=None):
+    path = path or _active_path
+    model = _models.get(path)
+    if model is None:
+        with _lock:
+            model = _models.get(path)
+            if model is None:
+                model = _load(path)
+                _models[path] = model
+                _versions[path] = artifact_version(path)
+    return model
+
+
+# Path and version of the model currently used for predictions
+def active_model():
+    return _active_path, _versions.get(_active_path, artifact_version(_active_path))
+
+
+# Load the given artifacts and run one dummy batch so the first click is fast
+def warm_up(paths=None):
+    for path in paths or [_active_path]:
+        if path in _warmed or not os.path.exists(path):
+            continue
+        model = get_model(path)
+        model.predict(np.zeros((1,) + INPUT_SHAPE, dtype=np.float32), verbose=0)
+        _warmed.add(path)
+
+
+# Load a new model version and make it the active one without a restart
+def swap_model(path, warm=True):
+    global _active_path
+    with _lock:
+        model = _load(path)
+        old_path = _active_path
+        _models[path] = model
+        _versions[path] = artifact_version(path)
+        _warmed.discard(path)
+        _active_path = path
+        if old_path != path:
+            _models.pop(old_path, None)
+            _versions.pop(old_path, None)
+            _warmed.discard(old_path)
+    if warm:
+        warm_up([path])
+    return active_model()
@@ -0,0 +1,122 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import fileio
+
+# Cache sizing, the on-disk tier is only used when a directory is configured
+CACHE_SIZE = int(os.environ.get("PLANT_PREDICTION_CACHE_SIZE", "4096"))
+CACHE_DIR = os.environ.get("PLANT_PREDICTION_CACHE_DIR") or None
+
+
+# Softmax rows keyed by image content and model version: LRU in memory, optional .npy files on disk
+class PredictionCache:
+    def __init__(self, max_entries=CACHE_SIZE, cache_dir=CACHE_DIR):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        if cache_dir and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    # Same bytes scored by the same model version always map to the same key
+    @staticmethod
+    def key(image_bytes, model_version):
+        digest = hashlib.sha256()
+        digest.update(model_version.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(image_bytes)
+        return digest.hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def get(self, key):
+        with self._lock:
+            predictions = self._entries.get(key)
+            if predictions is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return predictions
+        if self.cache_dir and os.path.exists(self._disk_path(key)):
+            try:
+                predictions = np.load(self._disk_path(key))
+            except (OSError, ValueError):
+                predictions = None
+            if predictions is not None:
+                self._remember(key, predictions)
+                with self._lock:
+                    self.hits += 1
+                    self.disk_hits += 1
+                return predictions
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, predictions):
+        predictions = np.asarray(predictions, dtype=np.float32)
+        self._remember(key, predictions)
+        if self.cache_dir:
+            fileio.write_atomic(self._disk_path(key), lambda f: np.save(f, predictions))
+
+    def _remember(self, key, predictions):
+        with self._lock:
+            self._entries[key] = predictions
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+
+# Raw bytes of an image given as a path, bytes or an upload buffer
+def read_image_bytes(source):
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    if hasattr(source, "getvalue"):
+        return source.getvalue()
+    with open(source, "rb") as f:
+        return f.read()
+
+
+# Return softmax rows for every image, calling predict_many only for cache misses.
+# fingerprint maps a source to the content bytes (or content digest) that identify it.
+def predict_cached(cache, sources, model_version, predict_many, fingerprint=read_image_bytes):
+    sources = list(sources)
+    keys = [cache.key(fingerprint(source), model_version) for source in sources]
+    predictions = [cache.get(key) for key in keys]
+    misses = [i for i, row in enumerate(predictions) if row is None]
+    if misses:
+        fresh = predict_many([sources[i] for i in misses])
+        for i, row in zip(misses, fresh):
+            cache.put(keys[i], row)
+            predictions[i] = row
+    return np.stack(predictions)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+# Process-wide cache shared by every Streamlit session
+def get_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = PredictionCache()
+    return _cache
@@ -0,0 +1,95 @@
+import argparse
+import os
+import time
+import uuid
+import batching_server
+import calibration
+import class_metadata
+import image_ingest
+import job_queue
+import metrics
+import model_registry
+import prediction_cache
+import submission_store
+
+KIND = "predict"
+WORKERS = int(os.environ.get("PLANT_QUEUE_WORKERS", "2"))
+BATCH_SIZE = int(os.environ.get("PLANT_QUEUE_BATCH_SIZE", "8"))
+
+
+# Calibrated top-k [(class index, probability), ...] of several ingested images, repeated uploads come from the cache
+def predict_top_k(artifacts_list):
+    if not artifacts_list:
+        return []
+    model_path, model_version = model_registry.active_model()
+    predictions = prediction_cache.predict_cached(
+        prediction_cache.get_cache(), artifacts_list, model_version,
+        lambda misses: batching_server.get_batcher().predict_arrays([image_ingest.load_tensor(a) for a in misses]),
+        fingerprint=lambda artifacts: artifacts.digest.encode("ascii"))
+    # Output indices of this model -> rows of the shared class table
+    model_table = class_metadata.get_model_table(model_path)
+    return [[(model_table.table_indices[index], probability)
+             for index, probability in calibration.top_k(row, calibration.TOP_K, model_table.temperature)]
+            for row in predictions]
+
+
+# Result dict shown on the page and stored with the submission
+def build_result(ranked):
+    class_table = class_metadata.get_class_table()
+    best_index, confidence = ranked[0]
+    result = class_table.result(best_index)
+    result["confidence"] = round(confidence, 4)
+    result["top_k"] = [{"label": class_table.labels[index], "probability": round(probability, 4)}
+                       for index, probability in ranked]
+    return result
+
+
+# Queue handler: predict a batch of uploads and log every result, once per job even when a job is retried
+def handle(payloads):
+    artifacts_list = [image_ingest.Artifacts(**payload["artifacts"]) for payload in payloads]
+    with metrics.stage("prediction"):
+        ranked_list = predict_top_k(artifacts_list)
+    results = []
+    with metrics.stage("log_submission"):
+        for payload, artifacts, ranked in zip(payloads, artifacts_list, ranked_list):
+            result = build_result(ranked)
+            submission_store.add_submission(payload["mobile_number"], artifacts.original_path, result,
+                                            job_key=payload.get("job_key"))
+            results.append(result)
+    return results
+
+
+# A job that failed for good logged nothing: drop its stored upload unless a submission or another job still uses it
+def discard(payload):
+    artifacts = image_ingest.Artifacts(**payload["artifacts"])
+    if submission_store.has_image(artifacts.original_path):
+        return
+    if any(job["payload"]["artifacts"]["digest"] == artifacts.digest for job in job_queue.active_jobs(KIND)):
+        return
+    image_ingest.delete_upload(artifacts.original_path)
+
+
+def get_pool(workers=WORKERS, batch_size=BATCH_SIZE):
+    return job_queue.get_pool(KIND, handle, workers, batch_size, on_failed=discard)
+
+
+# Queue one prediction job per ingested upload, raises job_queue.QueueFull when the queue is full
+def submit(artifacts_list, mobile_number):
+    job_ids = job_queue.enqueue(KIND, [{"artifacts": artifacts._asdict(), "mobile_number": mobile_number,
+                                        "job_key": uuid.uuid4().hex} for artifacts in artifacts_list])
+    get_pool().notify()
+    return job_ids
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run prediction queue workers outside the Streamlit process.")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    model_registry.warm_up()
+    get_pool(args.workers, args.batch_size)
+    print(f"{args.workers} prediction workers on {job_queue.QUEUE_DB}")
+    while True:
+        time.sleep(60)
+        metrics.write_stats_file()
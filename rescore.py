@@ -0,0 +1,156 @@
+import argparse
+import json
+import os
+import time
+from collections import Counter
+import numpy as np
+import tensorflow as tf
+import model_registry
+import class_metadata
+import image_ingest
+import image_decode
+import submission_store
+import cpu
+
+
+# Images already written to the results file by an interrupted run.
+# A torn last line from a crash is cut off so new results append cleanly.
+def load_checkpoint(output_path):
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    valid_bytes = 0
+    with open(output_path, 'rb') as f:
+        for line in f:
+            try:
+                if not line.endswith(b"\n"):
+                    raise ValueError("incomplete line")
+                done.add(json.loads(line)["image_path"])
+            except (ValueError, KeyError):
+                break
+            valid_bytes += len(line)
+    with open(output_path, 'r+b') as f:
+        f.truncate(valid_bytes)
+    return done
+
+
+# Latest stored prediction per image path
+def previous_predictions():
+    previous = {}
+    for entry in submission_store.list_submissions():
+        previous[os.path.normpath(entry["image_path"])] = entry["predicted_class"]
+    return previous
+
+
+# Same reduced-resolution, EXIF-upright decode as the app, run on the tf.data worker threads
+def _decode(path):
+    image = tf.numpy_function(
+        lambda p: image_decode.decode_into(p.decode("utf-8"), np.empty(model_registry.INPUT_SHAPE, dtype=np.float32)),
+        [path], tf.float32)
+    image.set_shape(model_registry.INPUT_SHAPE)
+    return path, image
+
+
+def build_dataset(paths, batch_size, workers):
+    dataset = tf.data.Dataset.from_tensor_slices(paths)
+    dataset = dataset.map(_decode, num_parallel_calls=workers, deterministic=True)
+    dataset = dataset.ignore_errors()
+    options = tf.data.Options()
+    options.threading.private_threadpool_size = workers
+    dataset = dataset.with_options(options)
+    return dataset.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+
+def rescore(images_dir, model_path, output_path, report_path, batch_size, workers, class_table):
+    paths = image_ingest.list_images(images_dir)
+    done = load_checkpoint(output_path)
+    todo = [path for path in paths if path not in done]
+    previous = previous_predictions()
+    model = model_registry.get_model(model_path)
+    model_version = model_registry.artifact_version(model_path)
+    print(f"{len(paths)} images, {len(done)} already scored, {len(todo)} to go with {workers} workers")
+
+    started = time.perf_counter()
+    scored = 0
+    if todo:
+        with open(output_path, 'a') as out:
+            for batch_paths, batch_images in build_dataset(todo, batch_size, workers):
+                predictions = np.asarray(model.predict_on_batch(batch_images))
+                for path, row in zip(batch_paths.numpy(), predictions):
+                    path = path.decode("utf-8")
+                    index = int(np.argmax(row))
+                    out.write(json.dumps({
+                        "image_path": path,
+                        "model_version": model_version,
+                        "class_index": index,
+                        "prediction": class_table.labels[index],
+                        "confidence": float(row[index]),
+                        "previous_prediction": previous.get(path),
+                    }, ensure_ascii=False) + "\n")
+                out.flush()
+                scored += len(predictions)
+                print(f"  {scored}/{len(todo)} ({scored / (time.perf_counter() - started):.1f} images/sec)", flush=True)
+
+    report = disagreement_report(output_path, set(paths), class_table)
+    report["elapsed_sec"] = time.perf_counter() - started
+    report["model_version"] = model_version
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    return report
+
+
+# Old-vs-new comparison over the whole results file, old labels or localized names are matched by class index
+def disagreement_report(output_path, paths, class_table):
+    results = {}
+    with open(output_path, 'r') as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            results[result["image_path"]] = result
+    counts = Counter()
+    changes = Counter()
+    disagreements = []
+    for path, result in sorted(results.items()):
+        old, new = result["previous_prediction"], result["prediction"]
+        old_index = class_table.index_of(old)
+        if old is None:
+            counts["no_previous"] += 1
+        elif old_index is None:
+            counts["unmatched_label"] += 1
+        elif old_index == result["class_index"]:
+            counts["agree"] += 1
+        else:
+            old = class_table.labels[old_index]
+            counts["disagree"] += 1
+            changes[f"{old} -> {new}"] += 1
+            disagreements.append({"image_path": path, "old": old, "new": new, "confidence": result["confidence"]})
+    return {
+        "images": len(paths),
+        "scored": len(results),
+        "failed": sorted(paths - set(results)),
+        "counts": dict(counts),
+        "changes": dict(changes.most_common()),
+        "disagreements": disagreements,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-classify the upload archive and compare with stored predictions.")
+    parser.add_argument("--images-dir", default=image_ingest.UPLOAD_DIR)
+    parser.add_argument("--model", default=model_registry.DEFAULT_MODEL_PATH)
+    parser.add_argument("--output", default="rescore_results.jsonl", help="per-image results, also the resume checkpoint")
+    parser.add_argument("--report", default="rescore_report.json")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=cpu.core_count())
+    parser.add_argument("--restart", action="store_true", help="ignore results from a previous run")
+    args = parser.parse_args()
+
+    tf.config.threading.set_intra_op_parallelism_threads(args.workers)
+    tf.config.threading.set_inter_op_parallelism_threads(2)
+    if args.restart and os.path.exists(args.output):
+        os.remove(args.output)
+    report = rescore(args.images_dir, args.model, args.output, args.report, args.batch_size, args.workers,
+                     class_metadata.get_model_table(args.model))
+    print(json.dumps(report["counts"], indent=2))
@@ -0,0 +1,164 @@
+import json
+import os
+from datetime import datetime
+import db
+
+DB_PATH = os.environ.get("PLANT_SUBMISSIONS_DB", "submissions.db")
+LEGACY_JSON_PATH = "user_inputs.json"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    mobile_number TEXT,
+    image_path TEXT NOT NULL,
+    predicted_class TEXT,
+    prediction TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    job_key TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_submissions_mobile ON submissions (mobile_number);
+CREATE INDEX IF NOT EXISTS idx_submissions_class ON submissions (predicted_class);
+CREATE INDEX IF NOT EXISTS idx_submissions_timestamp ON submissions (timestamp);
+CREATE INDEX IF NOT EXISTS idx_submissions_image_path ON submissions (image_path);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+# Queue jobs log through their job key, so a retried job cannot store its submission twice
+JOB_KEY_INDEX = "CREATE UNIQUE INDEX IF NOT EXISTS idx_submissions_job_key ON submissions (job_key)"
+
+def _init(conn):
+    conn.executescript(SCHEMA)
+    _add_job_key_column(conn)
+    migrate_from_json(LEGACY_JSON_PATH, conn)
+
+
+def _connect(db_path=None):
+    return db.connect(db_path or DB_PATH, _init)
+
+
+# Databases created before the queue have no job_key column; the check and the ALTER share one
+# write transaction so processes upgrading the same database together do not both add it
+def _add_job_key_column(conn):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(submissions)")]
+        if "job_key" not in columns:
+            conn.execute("ALTER TABLE submissions ADD COLUMN job_key TEXT")
+        conn.execute(JOB_KEY_INDEX)
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+# Label stored in the indexed column: the class label of a result dict, or the legacy class string
+def _predicted_class(prediction):
+    if isinstance(prediction, dict):
+        return prediction.get("label") or prediction.get("রোগ")
+    return prediction
+
+
+def _row_to_dict(row):
+    entry = dict(row)
+    entry["prediction"] = json.loads(entry["prediction"])
+    return entry
+
+
+# One-time import of the old rewrite-whole-file log. The meta row is claimed first, in the same
+# transaction as the import, so of several processes opening a fresh database only one imports.
+def migrate_from_json(json_path=LEGACY_JSON_PATH, conn=None):
+    conn = conn or _connect()
+    if not os.path.exists(json_path):
+        return 0
+    if conn.execute("SELECT 1 FROM meta WHERE key = ?", (f"migrated:{json_path}",)).fetchone():
+        return 0  # Fast path, the claim below decides
+    with open(json_path, 'r') as f:
+        inputs = json.load(f)
+    with conn:
+        claimed = conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)",
+                               (f"migrated:{json_path}", str(datetime.now()))).rowcount
+        if not claimed:
+            return 0
+        conn.executemany(
+            "INSERT INTO submissions (mobile_number, image_path, predicted_class, prediction, timestamp) VALUES (?, ?, ?, ?, ?)",
+            [(entry.get("mobile_number"), entry["image_path"], _predicted_class(entry["prediction"]),
+              json.dumps(entry["prediction"], ensure_ascii=False), entry["timestamp"]) for entry in inputs])
+    return len(inputs)
+
+
+# Append one prediction, O(1) regardless of history size.
+# With a job_key the insert happens at most once: a repeat returns the id of the row already stored.
+def add_submission(mobile_number, image_path, prediction, timestamp=None, job_key=None):
+    conn = _connect()
+    with conn:
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO submissions (mobile_number, image_path, predicted_class, prediction, timestamp, job_key) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (mobile_number, image_path, _predicted_class(prediction),
+             json.dumps(prediction, ensure_ascii=False), timestamp or str(datetime.now()), job_key))
+        if cursor.rowcount == 0:
+            return conn.execute("SELECT id FROM submissions WHERE job_key = ?", (job_key,)).fetchone()[0]
+    return cursor.lastrowid
+
+
+def has_image(image_path):
+    return _connect().execute("SELECT 1 FROM submissions WHERE image_path = ? LIMIT 1", (image_path,)).fetchone() is not None
+
+
+def list_submissions():
+    rows = _connect().execute("SELECT * FROM submissions ORDER BY id").fetchall()
+    return [_row_to_dict(row) for row in rows]
+
+
+# WHERE clause for the admin filters, every column used here is indexed
+def _filters(mobile_number=None, predicted_class=None, start=None, end=None):
+    clauses, params = [], []
+    if mobile_number:
+        clauses.append("mobile_number = ?")
+        params.append(mobile_number)
+    if predicted_class:
+        clauses.append("predicted_class = ?")
+        params.append(predicted_class)
+    if start:
+        clauses.append("timestamp >= ?")
+        params.append(str(start))
+    if end:
+        clauses.append("timestamp < ?")
+        params.append(str(end))
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+# Newest-first page of submissions, only the requested rows are read
+def query_submissions(limit=25, offset=0, **filters):
+    where, params = _filters(**filters)
+    rows = _connect().execute(f"SELECT * FROM submissions{where} ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?",
+                              params + [limit, offset]).fetchall()
+    return [_row_to_dict(row) for row in rows]
+
+
+def count_submissions(**filters):
+    where, params = _filters(**filters)
+    return _connect().execute(f"SELECT COUNT(*) FROM submissions{where}", params).fetchone()[0]
+
+
+def predicted_classes():
+    rows = _connect().execute(
+        "SELECT DISTINCT predicted_class FROM submissions WHERE predicted_class IS NOT NULL ORDER BY predicted_class")
+    return [row[0] for row in rows]
+
+
+def delete_submission(submission_id):
+    delete_submissions([submission_id])
+
+
+# Delete several submissions in one transaction, returns image paths no other submission still uses
+def delete_submissions(submission_ids):
+    submission_ids = list(submission_ids)
+    if not submission_ids:
+        return []
+    conn = _connect()
+    placeholders = ", ".join("?" for _ in submission_ids)
+    with conn:
+        rows = conn.execute(f"SELECT DISTINCT image_path FROM submissions WHERE id IN ({placeholders})", submission_ids).fetchall()
+        conn.execute(f"DELETE FROM submissions WHERE id IN ({placeholders})", submission_ids)
+        return [row[0] for row in rows
+                if conn.execute("SELECT 1 FROM submissions WHERE image_path = ? LIMIT 1", (row[0],)).fetchone() is None]
@@ -0,0 +1,42 @@
+import os
+import sys
+import numpy as np
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import image_decode
+
+
+# 2000x1500 photo-like JPEG (smooth gradients plus texture), stored sideways with an EXIF orientation tag
+@pytest.fixture
+def rotated_jpeg(tmp_path):
+    height, width = 1500, 2000
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    noise = np.random.default_rng(0).normal(0, 6, (height, width))
+    pixels = np.stack([x / width * 255, y / height * 255, 128 + 60 * np.sin(x / 40) * np.cos(y / 55) + noise], axis=-1)
+    image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+    exif = image.getexif()
+    exif[0x0112] = 6
+    path = str(tmp_path / "leaf.jpg")
+    image.save(path, quality=90, exif=exif)
+    return path
+
+
+def test_decode_matches_load_img(rotated_jpeg):
+    report = image_decode.parity_check([rotated_jpeg])
+    assert report["images"] == 1
+    assert not report["failures"], report
+
+
+def test_decode_is_upright(rotated_jpeg):
+    out = image_decode.decode_into(rotated_jpeg, np.empty(image_decode.model_registry.INPUT_SHAPE, dtype=np.float32))
+    # Orientation 6 is a 90 degree clockwise turn: the red (x) gradient of the stored image now runs top to bottom
+    assert out[-1, :, 0].mean() - out[0, :, 0].mean() > 150
+    assert abs(out[:, -1, 0].mean() - out[:, 0, 0].mean()) < 20
+
+
+def test_decode_refuses_oversized_image(rotated_jpeg, monkeypatch):
+    monkeypatch.setattr(image_decode, "MAX_PIXELS", 1000 * 1000)
+    with pytest.raises(ValueError):
+        image_decode.decode_into(rotated_jpeg)
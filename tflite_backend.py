@@ -0,0 +1,135 @@
+import argparse
+import json
+import os
+import threading
+import numpy as np
+import tensorflow as tf
+import model_registry
+import class_metadata
+import image_ingest
+import image_decode
+import inference
+
+TFLITE_THREADS = int(os.environ.get("PLANT_TFLITE_THREADS", "0")) or os.cpu_count() or 1
+# Run the builtin kernels straight from the memory-mapped flatbuffer instead of the default XNNPACK delegate.
+# XNNPACK repacks the weights into private memory in every process; the builtin kernels are slower but leave
+# the weights as clean file-backed pages that all worker processes share.
+SHARED_WEIGHTS = os.environ.get("PLANT_TFLITE_SHARED_WEIGHTS", "0") == "1"
+QUANTIZATION_MODES = ("none", "dynamic", "int8")
+
+
+# TFLite interpreter with the predict/predict_on_batch surface the rest of the app uses from Keras
+class TFLiteModel:
+    def __init__(self, path, num_threads=TFLITE_THREADS, shared_weights=SHARED_WEIGHTS):
+        self.path = path
+        options = {}
+        if shared_weights:
+            options["experimental_op_resolver_type"] = tf.lite.experimental.OpResolverType.BUILTIN_WITHOUT_DEFAULT_DELEGATES
+        self._interpreter = tf.lite.Interpreter(model_path=path, num_threads=num_threads, **options)
+        self._interpreter.allocate_tensors()
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+        self._allocated_batch = int(self._input["shape"][0])
+        self.output_shape = (None,) + tuple(int(d) for d in self._output["shape"][1:])
+        self._lock = threading.Lock()
+
+    # Batches are padded to a power of two so the interpreter is not re-allocated for every size
+    def _ensure_batch(self, size):
+        bucket = 1 << (size - 1).bit_length()
+        if bucket != self._allocated_batch:
+            self._interpreter.resize_tensor_input(self._input["index"], (bucket,) + model_registry.INPUT_SHAPE)
+            self._interpreter.allocate_tensors()
+            self._input = self._interpreter.get_input_details()[0]
+            self._output = self._interpreter.get_output_details()[0]
+            self._allocated_batch = bucket
+        return bucket
+
+    def predict_on_batch(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        size = batch.shape[0]
+        with self._lock:
+            bucket = self._ensure_batch(size)
+            if bucket != size:
+                batch = np.concatenate([batch, np.zeros((bucket - size,) + batch.shape[1:], dtype=np.float32)])
+            scale, zero_point = self._input["quantization"]
+            if self._input["dtype"] != np.float32:
+                batch = np.clip(np.round(batch / scale + zero_point), np.iinfo(self._input["dtype"]).min,
+                                np.iinfo(self._input["dtype"]).max)
+            self._interpreter.set_tensor(self._input["index"], batch.astype(self._input["dtype"]))
+            self._interpreter.invoke()
+            output = self._interpreter.get_tensor(self._output["index"])[:size]
+            scale, zero_point = self._output["quantization"]
+            if self._output["dtype"] != np.float32:
+                output = (output.astype(np.float32) - zero_point) * scale
+            return output.astype(np.float32)
+
+    def predict(self, x, batch_size=inference.DEFAULT_BATCH_SIZE, verbose=0):
+        return np.concatenate([self.predict_on_batch(x[start:start + batch_size])
+                               for start in range(0, len(x), batch_size)])
+
+
+# Preprocessed samples from the upload archive for int8 calibration
+def representative_images(images_dir=image_ingest.UPLOAD_DIR, samples=200):
+    for path in image_ingest.list_images(images_dir)[:samples]:
+        try:
+            yield image_decode.decode_into(path, np.empty(model_registry.INPUT_SHAPE, dtype=np.float32))
+        except (OSError, ValueError):
+            continue
+
+
+# Export a Keras artifact to TFLite, optionally with dynamic-range or int8 post-training quantization
+def convert(keras_path, tflite_path, quantization="none", calibration_dir=image_ingest.UPLOAD_DIR, samples=200):
+    if quantization not in QUANTIZATION_MODES:
+        raise ValueError(f"quantization must be one of {QUANTIZATION_MODES}, got {quantization!r}")
+    model = tf.keras.models.load_model(keras_path, compile=False)
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantization != "none":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == "int8":
+        calibration = list(representative_images(calibration_dir, samples))
+        if not calibration:
+            raise ValueError(f"No calibration images found in {calibration_dir}")
+        converter.representative_dataset = lambda: ([image[np.newaxis]] for image in calibration)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    with open(tflite_path, 'wb') as f:
+        f.write(converter.convert())
+    class_metadata.write_labels(tflite_path, class_metadata.get_model_table(keras_path).labels)
+    return tflite_path
+
+
+# Compare a candidate backend against the reference Keras model on the same images
+def parity_check(reference_path, candidate_path, image_paths, batch_size=inference.DEFAULT_BATCH_SIZE):
+    reference = inference.predict_batch(image_paths, batch_size, model_registry.get_model(reference_path))
+    candidate = inference.predict_batch(image_paths, batch_size, model_registry.get_model(candidate_path))
+    difference = np.abs(reference - candidate)
+    return {
+        "images": len(image_paths),
+        "top1_agreement": float(np.mean(reference.argmax(axis=1) == candidate.argmax(axis=1))) if len(image_paths) else 1.0,
+        "max_abs_diff": float(difference.max()) if difference.size else 0.0,
+        "mean_abs_diff": float(difference.mean()) if difference.size else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build TFLite models and check them against the Keras model.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    convert_parser = subparsers.add_parser("convert")
+    convert_parser.add_argument("--model", default=model_registry.DEFAULT_MODEL_PATH)
+    convert_parser.add_argument("--output", default="plant_disease_model.tflite")
+    convert_parser.add_argument("--quantization", choices=QUANTIZATION_MODES, default="none")
+    convert_parser.add_argument("--calibration-dir", default=image_ingest.UPLOAD_DIR)
+    convert_parser.add_argument("--samples", type=int, default=200)
+    parity_parser = subparsers.add_parser("parity")
+    parity_parser.add_argument("--reference", default=model_registry.DEFAULT_MODEL_PATH)
+    parity_parser.add_argument("--candidate", default="plant_disease_model.tflite")
+    parity_parser.add_argument("--images-dir", default=image_ingest.UPLOAD_DIR)
+    parity_parser.add_argument("--min-agreement", type=float, default=0.99)
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        print(convert(args.model, args.output, args.quantization, args.calibration_dir, args.samples))
+    else:
+        result = parity_check(args.reference, args.candidate, image_ingest.list_images(args.images_dir))
+        print(json.dumps(result, indent=2))
+        if result["top1_agreement"] < args.min_agreement:
+            raise SystemExit(f"Top-1 agreement {result['top1_agreement']:.3f} is below {args.min_agreement}")
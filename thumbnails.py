@@ -0,0 +1,49 @@
+import hashlib
+import os
+from PIL import Image, ImageOps
+import fileio
+
+THUMBNAIL_DIR = os.path.join("uploaded_images", ".thumbnails")
+THUMBNAIL_SIZE = (256, 256)
+
+
+# Thumbnail written by image_ingest for a content-addressed upload
+def content_thumbnail_path(digest):
+    return os.path.join(THUMBNAIL_DIR, f"{digest}.jpg")
+
+
+# Shrink an opened image and save it as a JPEG preview
+def save_thumbnail(image, thumb_path, size=THUMBNAIL_SIZE):
+    image = ImageOps.exif_transpose(image).convert("RGB")
+    image.thumbnail(size)
+    fileio.write_atomic(thumb_path, lambda f: image.save(f, "JPEG", quality=80))
+
+
+# Preview named after the path and mtime of an image that was not ingested by content
+def _path_thumbnail(image_path, size=THUMBNAIL_SIZE):
+    stat = os.stat(image_path)
+    name = hashlib.sha1(f"{os.path.abspath(image_path)}:{stat.st_mtime_ns}:{size}".encode("utf-8")).hexdigest()
+    return os.path.join(THUMBNAIL_DIR, f"{name}.jpg")
+
+
+# Every preview file that may exist for image_path
+def thumbnail_paths(image_path):
+    digest = os.path.splitext(os.path.basename(image_path))[0]
+    paths = [content_thumbnail_path(digest)]
+    if os.path.exists(image_path):
+        paths.append(_path_thumbnail(image_path))
+    return paths
+
+
+# Path of a small JPEG preview of image_path, created on first use and refreshed when the original changes
+def thumbnail_path(image_path, size=THUMBNAIL_SIZE):
+    digest = os.path.splitext(os.path.basename(image_path))[0]
+    if size == THUMBNAIL_SIZE and os.path.exists(content_thumbnail_path(digest)):
+        return content_thumbnail_path(digest)
+    thumb_path = _path_thumbnail(image_path, size)
+    if not os.path.exists(thumb_path):
+        os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+        with Image.open(image_path) as image:
+            image.draft("RGB", size)
+            save_thumbnail(image, thumb_path, size)
+    return thumb_path
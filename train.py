@@ -0,0 +1,202 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+import numpy as np
+import tensorflow as tf
+import class_metadata
+import calibration
+import model_registry
+import cpu
+import fileio
+
+# Script version of Train_plant_disease.ipynb with a tf.data pipeline that decodes every image once
+IMAGE_SIZE = model_registry.INPUT_SHAPE[:2]
+CACHE_DIR = os.environ.get("PLANT_TRAIN_CACHE_DIR", ".train_cache")
+
+
+# Same architecture as the notebook, one output unit per class
+def build_model(num_classes, learning_rate=0.0001):
+    layers = tf.keras.layers
+    cnn = tf.keras.models.Sequential([tf.keras.Input(shape=model_registry.INPUT_SHAPE)])
+    for filters in (32, 64, 128, 256, 512):
+        cnn.add(layers.Conv2D(filters=filters, kernel_size=3, padding='same', activation='relu'))
+        cnn.add(layers.Conv2D(filters=filters, kernel_size=3, activation='relu'))
+        cnn.add(layers.MaxPool2D(pool_size=2, strides=2))
+    cnn.add(layers.Dropout(0.25))
+    cnn.add(layers.Flatten())
+    cnn.add(layers.Dense(units=1500, activation='relu'))
+    cnn.add(layers.Dropout(0.4))  # To avoid overfitting
+    # Softmax stays float32 under mixed precision
+    cnn.add(layers.Dense(units=num_classes, activation='softmax', dtype="float32"))
+    cnn.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
+                loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+    return cnn
+
+
+# Labelled images of one or more PlantVillage-style directories, labels are class_metadata indices
+def labelled_files(image_dirs, class_table):
+    paths, indices = [], []
+    for image_dir in image_dirs:
+        unknown = [name for name in sorted(os.listdir(image_dir))
+                   if os.path.isdir(os.path.join(image_dir, name)) and class_table.index_of(name) is None]
+        if unknown:
+            print(f"{image_dir}: skipping folders not in {class_table.path}: {', '.join(unknown)}")
+        dir_paths, dir_indices = calibration.labelled_images(image_dir, class_table)
+        paths.extend(dir_paths)
+        indices.extend(dir_indices)
+    return paths, indices
+
+
+# Cache name changes whenever a file is added, removed or replaced, or the resize method changes
+def _cache_key(paths, indices, interpolation):
+    digest = hashlib.sha1(f"{IMAGE_SIZE}:{interpolation}".encode("utf-8"))
+    for path, index in zip(paths, indices):
+        stat = os.stat(path)
+        digest.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns}:{index}\n".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def _decode(path, label, interpolation):
+    image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+    image = tf.image.resize(image, IMAGE_SIZE, method=interpolation)
+    return tf.cast(tf.clip_by_value(tf.round(image), 0, 255), tf.uint8), label
+
+
+# Decode and resize every image once, in parallel, into a uint8 array on disk (N x 128 x 128 x 3).
+# Later runs and epochs read the memory-mapped array instead of the JPEGs.
+def build_cache(name, paths, indices, interpolation="bilinear", cache_dir=CACHE_DIR, workers=None):
+    workers = workers or cpu.core_count()
+    key = _cache_key(paths, indices, interpolation)
+    images_path = os.path.join(cache_dir, f"{name}-{key}.npy")
+    labels_path = os.path.join(cache_dir, f"{name}-{key}.labels.npy")
+    if os.path.exists(images_path) and os.path.exists(labels_path):
+        return np.load(images_path, mmap_mode="r"), np.load(labels_path)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    started = time.perf_counter()
+    dataset = tf.data.Dataset.from_tensor_slices((paths, np.asarray(indices, dtype=np.int32)))
+    dataset = dataset.map(lambda path, label: _decode(path, label, interpolation), num_parallel_calls=workers, deterministic=True)
+    dataset = dataset.ignore_errors()  # Unreadable files are dropped together with their label
+    options = tf.data.Options()
+    options.threading.private_threadpool_size = workers
+    dataset = dataset.with_options(options).batch(256).prefetch(tf.data.AUTOTUNE)
+
+    with fileio.atomic_path(images_path) as tmp_path:
+        images = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.uint8, shape=(len(paths),) + model_registry.INPUT_SHAPE)
+        labels, count = [], 0
+        for batch_images, batch_labels in dataset:
+            images[count:count + len(batch_labels)] = batch_images.numpy()
+            labels.append(batch_labels.numpy())
+            count += len(batch_labels)
+        images.flush()
+        del images
+        labels = np.concatenate(labels) if labels else np.empty((0,), dtype=np.int32)
+        if count < len(paths):
+            # Rewrite without the unused tail left by skipped files
+            full = np.load(tmp_path, mmap_mode="r")
+            fileio.write_atomic(tmp_path, lambda f: np.save(f, full[:count]))
+            del full
+            print(f"{name}: skipped {len(paths) - count} unreadable images")
+        fileio.write_atomic(labels_path, lambda f: np.save(f, labels))
+    print(f"{name}: cached {count} images in {time.perf_counter() - started:.0f}s -> {images_path}")
+    return np.load(images_path, mmap_mode="r"), labels
+
+
+# Batches gathered from the memory-mapped cache: shuffled indices, sorted within a batch for sequential reads
+def make_dataset(images, labels, batch_size, shuffle, seed=None, workers=None):
+    workers = workers or cpu.core_count()
+
+    def gather(batch_indices):
+        batch_indices = np.sort(batch_indices)
+        return np.asarray(images[batch_indices]), labels[batch_indices]
+
+    def load(batch_indices):
+        batch_images, batch_labels = tf.numpy_function(gather, [batch_indices], [tf.uint8, tf.int32])
+        batch_images.set_shape((None,) + model_registry.INPUT_SHAPE)
+        batch_labels.set_shape((None,))
+        return tf.cast(batch_images, tf.float32), batch_labels
+
+    dataset = tf.data.Dataset.range(len(labels))
+    if shuffle:
+        dataset = dataset.shuffle(len(labels), seed=seed, reshuffle_each_iteration=True)
+    dataset = dataset.batch(batch_size).map(load, num_parallel_calls=workers, deterministic=not shuffle)
+    options = tf.data.Options()
+    options.threading.private_threadpool_size = workers
+    return dataset.with_options(options).prefetch(tf.data.AUTOTUNE)
+
+
+# Wall time and images/sec of every training epoch (validation included in the wall time)
+class EpochThroughput(tf.keras.callbacks.Callback):
+    def __init__(self, images_per_epoch):
+        super().__init__()
+        self.images_per_epoch = images_per_epoch
+        self.images_per_sec = []
+        self.epoch_seconds = []
+        self._started = None
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._started = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        seconds = time.perf_counter() - self._started
+        self.epoch_seconds.append(seconds)
+        self.images_per_sec.append(self.images_per_epoch / seconds)
+        print(f"epoch {epoch + 1}: {self.images_per_sec[-1]:.1f} images/sec")
+
+
+def train(train_dirs, valid_dirs, epochs=25, batch_size=32, learning_rate=0.0001, interpolation="bilinear",
+          mixed_precision=False, seed=None, cache_dir=CACHE_DIR, output_path="trained_plant_disease_model.keras",
+          history_path="training_hist.json"):
+    if mixed_precision:
+        # bfloat16 is the reduced precision CPUs accelerate (AVX512_BF16 / AMX); float16 only pays off on GPUs
+        tf.keras.mixed_precision.set_global_policy("mixed_bfloat16")
+    class_table = class_metadata.get_class_table()
+    train_paths, train_indices = labelled_files(train_dirs, class_table)
+    # One output unit per class that has training images, in sorted label order like the notebook's
+    # image_dataset_from_directory: 38 for PlantVillage, which has no Sweet_Potato_Healthy folder
+    model_table = class_table.subset(sorted({class_table.labels[index] for index in train_indices}))
+    train_indices = [model_table.index_of(class_table.labels[index]) for index in train_indices]
+    train_images, train_labels = build_cache("train", train_paths, train_indices, interpolation, cache_dir)
+    valid_images, valid_labels = build_cache("valid", *labelled_files(valid_dirs, model_table), interpolation, cache_dir)
+    training_set = make_dataset(train_images, train_labels, batch_size, shuffle=True, seed=seed)
+    validation_set = make_dataset(valid_images, valid_labels, batch_size, shuffle=False)
+
+    if seed is not None:
+        tf.keras.utils.set_random_seed(seed)
+    cnn = build_model(len(model_table), learning_rate)
+    throughput = EpochThroughput(len(train_labels))
+    training_history = cnn.fit(x=training_set, validation_data=validation_set, epochs=epochs, callbacks=[throughput])
+    cnn.save(output_path)
+    class_metadata.write_labels(output_path, model_table.labels)
+
+    # Accuracy of the last epoch from the history, no extra evaluate() pass over 70k training images
+    history = {key: [float(value) for value in values] for key, values in training_history.history.items()}
+    history["images_per_sec"] = throughput.images_per_sec
+    history["epoch_seconds"] = throughput.epoch_seconds
+    with open(history_path, 'w') as f:
+        json.dump(history, f)
+    print('Training accuracy:', history["accuracy"][-1])
+    print('Validation accuracy:', history["val_accuracy"][-1])
+    return cnn, history
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the plant disease CNN from PlantVillage-style folders.")
+    parser.add_argument("--train-dir", nargs="+", default=["train"],
+                        help="one or more folders with one sub-folder per class label, e.g. train plus a curated upload archive")
+    parser.add_argument("--valid-dir", nargs="+", default=["valid"])
+    parser.add_argument("--epochs", type=int, default=25)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--learning-rate", type=float, default=0.0001)
+    parser.add_argument("--interpolation", default="bilinear", help="resize method, the notebook used bilinear")
+    parser.add_argument("--mixed-precision", action="store_true", help="train in bfloat16 with float32 weights")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--output", default="trained_plant_disease_model.keras")
+    parser.add_argument("--history", default="training_hist.json")
+    args = parser.parse_args()
+
+    train(args.train_dir, args.valid_dir, args.epochs, args.batch_size, args.learning_rate, args.interpolation,
+          args.mixed_precision, args.seed, args.cache_dir, args.output, args.history)
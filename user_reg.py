@@ -1,29 +1,23 @@
 import streamlit as st
-import tensorflow as tf
-import numpy as np
-import json
-import os
+import model_registry
+import batching_server
+import prediction_cache
+import image_decode
+import class_metadata
+import calibration
+import user_store
 
-# TensorFlow Model Prediction
+MODEL_PATH = "trained_plant_disease_model.keras"
+
+# Label order of the model's outputs (38 classes, no sweet potato), parsed once per process
+class_table = class_metadata.get_model_table(MODEL_PATH)
+
+# TensorFlow Model Prediction, calibrated top-k [(class index, probability), ...]
 def model_prediction(test_image):
-    model = tf.keras.models.load_model("trained_plant_disease_model.keras")
-    image = tf.keras.preprocessing.image.load_img(test_image, target_size=(128, 128))
-    input_arr = tf.keras.preprocessing.image.img_to_array(image)
-    input_arr = np.array([input_arr])  # Convert single image to batch
-    predictions = model.predict(input_arr)
-    return np.argmax(predictions)  # Return index of max element
-
-# Function to load user data from JSON file
-def load_user_data():
-    if os.path.exists('user_data.json'):
-        with open('user_data.json', 'r') as f:
-            return json.load(f)
-    return {}
-
-# Function to save user data to JSON file
-def save_user_data(user_data):
-    with open('user_data.json', 'w') as f:
-        json.dump(user_data, f)
+    predictions = prediction_cache.predict_cached(prediction_cache.get_cache(), [test_image],
+                                                  model_registry.artifact_version(MODEL_PATH),
+                                                  batching_server.get_batcher(MODEL_PATH).predict_many)  # Repeats skip the model
+    return calibration.top_k(predictions[0], calibration.TOP_K, class_table.temperature)
 
 # Sidebar
 st.sidebar.title("Dashboard")
@@ -43,9 +37,6 @@ placeholder = st.empty()
 if 'logged_in' not in st.session_state:
     st.session_state.logged_in = False
 
-# Load user data from the file
-user_data = load_user_data()
-
 # Home page
 if app_mode == "Home":
     st.header("PLANT DISEASE RECOGNITION SYSTEM")
@@ -89,24 +80,21 @@ elif app_mode == "Disease Recognition":
             st.image(test_image, width=4, use_container_width=True)
             st.snow()
             st.write("Our Prediction")
-            result_index = model_prediction(test_image)
-            class_name = [
-                'Apple___Apple_scab', 'Apple___Black_rot', 'Apple___Cedar_apple_rust', 'Apple___healthy',
-                'Blueberry___healthy', 'Cherry_(including_sour)___Powdery_mildew', 
-                'Cherry_(including_sour)___healthy', 'Corn_(maize)___Cercospora_leaf_spot Gray_leaf_spot', 
-                'Corn_(maize)___Common_rust_', 'Corn_(maize)___Northern_Leaf_Blight', 'Corn_(maize)___healthy', 
-                'Grape___Black_rot', 'Grape___Esca_(Black_Measles)', 'Grape___Leaf_blight_(Isariopsis_Leaf_Spot)', 
-                'Grape___healthy', 'Orange___Haunglongbing_(Citrus_greening)', 'Peach___Bacterial_spot',
-                'Peach___healthy', 'Pepper,_bell___Bacterial_spot', 'Pepper,_bell___healthy', 
-                'Potato___Early_blight', 'Potato___Late_blight', 'Potato___healthy', 
-                'Raspberry___healthy', 'Soybean___healthy', 'Squash___Powdery_mildew', 
-                'Strawberry___Leaf_scorch', 'Strawberry___healthy', 'Tomato___Bacterial_spot', 
-                'Tomato___Early_blight', 'Tomato___Late_blight', 'Tomato___Leaf_Mold', 
-                'Tomato___Septoria_leaf_spot', 'Tomato___Spider_mites Two-spotted_spider_mite', 
-                'Tomato___Target_Spot', 'Tomato___Tomato_Yellow_Leaf_Curl_Virus', 'Tomato___Tomato_mosaic_virus',
-                'Tomato___healthy'
-            ]
-            st.success(f"Model is Predicting it's a {class_name[result_index]}")
+            try:
+                is_leaf, reason = calibration.leaf_check(image_decode.decode_into(test_image))
+            except (OSError, ValueError) as e:  # Unreadable file or over the pixel caps
+                is_leaf, reason = None, str(e)
+            if is_leaf is None:
+                st.warning(f"Could not read this image ({reason}). Please upload a JPEG or PNG photo.")
+            elif not is_leaf:
+                st.warning(f"This does not look like a leaf photo ({reason}).")
+            else:
+                ranked = model_prediction(test_image)
+                result_index, confidence = ranked[0]
+                st.success(f"Model is Predicting it's a {class_table.labels[result_index]} ({confidence:.0%})")
+                if confidence < calibration.MIN_CONFIDENCE:
+                    st.write("Other candidates: " + ", ".join(f"{class_table.labels[index]} ({probability:.0%})"
+                                                              for index, probability in ranked[1:]))
 
 # Registration form
 elif app_mode == "Register":
@@ -123,15 +111,15 @@ elif app_mode == "Register":
     if submit:
         if len(mobile_number) != 11:
             st.error("Please enter a valid 11-digit mobile number.")
-        elif mobile_number in user_data:
-            st.error("This mobile number is already registered.")
         elif password != confirm_password:
             st.error("Passwords do not match.")
         else:
-            # Store the user data (in a real app, this should be stored securely in a database)
-            user_data[mobile_number] = {"first_name": first_name, "last_name": last_name, "password": password}
-            save_user_data(user_data)  # Save the updated user data to the file
-            st.success("Registration successful! You can now log in.")
+            try:
+                user_store.create_user(password, mobile_number=mobile_number, first_name=first_name, last_name=last_name)
+            except ValueError as e:
+                st.error(str(e))
+            else:
+                st.success("Registration successful! You can now log in.")
 
 # Login form
 elif app_mode == "Login":
@@ -142,7 +130,7 @@ elif app_mode == "Login":
         login_submit = st.form_submit_button("Login")
 
     if login_submit:
-        if login_mobile_number in user_data and user_data[login_mobile_number]["password"] == login_password:
+        if user_store.authenticate(login_mobile_number, login_password) is not None:
             st.session_state.logged_in = True
             st.success("Login successful! You can now access the Disease Recognition page.")
             app_mode = "Disease Recognition"  # Redirect to Disease Recognition page
@@ -0,0 +1,173 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+import db
+
+DB_PATH = os.environ.get("PLANT_USERS_DB", "users.db")
+LEGACY_JSON_PATH = "user_data.json"
+MOBILE_NUMBER = re.compile(r"^\d{11}$")
+
+# username and mobile_number are both unique keys; either may be missing (user_reg.py registers by
+# mobile number only, the old admin.py form by username only), SQLite allows several NULLs in a UNIQUE column
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT UNIQUE,
+    mobile_number TEXT UNIQUE,
+    first_name TEXT,
+    last_name TEXT,
+    password TEXT NOT NULL,
+    created TEXT NOT NULL,
+    CHECK (username IS NOT NULL OR mobile_number IS NOT NULL)
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', '0');
+"""
+COLUMNS = ("id", "username", "mobile_number", "first_name", "last_name", "password", "created")
+
+# Process-wide read cache, dropped whenever the generation counter moves (a write from any process)
+_cache_lock = threading.Lock()
+_cache = {"generation": None, "users": None, "by_username": {}, "by_mobile": {}}
+
+
+def _init(conn):
+    conn.executescript(SCHEMA)
+    migrate_from_json(LEGACY_JSON_PATH, conn)
+
+
+def _connect(db_path=None):
+    return db.connect(db_path or DB_PATH, _init)
+
+
+# Every write bumps the counter inside its own transaction, so readers see the row change and the new generation together
+def _bump_generation(conn):
+    conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'generation'")
+
+
+def _generation(conn):
+    return int(conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0])
+
+
+def _conflict_message(error):
+    if "mobile_number" in str(error):
+        return "This mobile number is already registered."
+    if "username" in str(error):
+        return "Username already exists."
+    return str(error)
+
+
+# One-time import of the old user_data.json; its keys are usernames (admin.py) or mobile numbers (user_reg.py).
+# The meta row is claimed in the import transaction, so of several processes opening a fresh database only one imports.
+def migrate_from_json(json_path=LEGACY_JSON_PATH, conn=None):
+    conn = conn or _connect()
+    if not os.path.exists(json_path):
+        return 0
+    if conn.execute("SELECT 1 FROM meta WHERE key = ?", (f"migrated:{json_path}",)).fetchone():
+        return 0  # Fast path, the claim below decides
+    with open(json_path, 'r') as f:
+        users = json.load(f)
+    imported = 0
+    with conn:
+        if not conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)",
+                            (f"migrated:{json_path}", str(datetime.now()))).rowcount:
+            return 0
+        for key, entry in users.items():
+            mobile_number = entry.get("mobile_number") or (key if MOBILE_NUMBER.match(key) else None)
+            username = None if key == mobile_number else key
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO users (username, mobile_number, first_name, last_name, password, created) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (username, mobile_number, entry.get("first_name"), entry.get("last_name"), entry["password"],
+                 str(datetime.now())))
+            imported += cursor.rowcount
+        _bump_generation(conn)
+    return imported
+
+
+# All users, parsed once per generation instead of on every rerun
+def _users():
+    conn = _connect()
+    generation = _generation(conn)
+    with _cache_lock:
+        if _cache["generation"] == generation:
+            return _cache
+    rows = conn.execute(f"SELECT {', '.join(COLUMNS)} FROM users ORDER BY id").fetchall()
+    users = [dict(row) for row in rows]
+    with _cache_lock:
+        _cache["users"] = users
+        _cache["by_username"] = {user["username"]: user for user in users if user["username"]}
+        _cache["by_mobile"] = {user["mobile_number"]: user for user in users if user["mobile_number"]}
+        _cache["generation"] = generation
+        return _cache
+
+
+def list_users():
+    return [dict(user) for user in _users()["users"]]
+
+
+def get_user(username):
+    user = _users()["by_username"].get(username)
+    return dict(user) if user else None
+
+
+def get_user_by_mobile(mobile_number):
+    user = _users()["by_mobile"].get(mobile_number)
+    return dict(user) if user else None
+
+
+# Login with a username or a mobile number
+def authenticate(login, password):
+    user = get_user(login) or get_user_by_mobile(login)
+    if user is None or user["password"] != password:
+        return None
+    return user
+
+
+# Insert a new user; the UNIQUE constraints make concurrent registrations of the same name or number fail cleanly
+def create_user(password, username=None, mobile_number=None, first_name=None, last_name=None):
+    if not username and not mobile_number:
+        raise ValueError("A username or a mobile number is required.")
+    if mobile_number and not MOBILE_NUMBER.match(mobile_number):
+        raise ValueError("Please enter a valid 11-digit mobile number.")
+    conn = _connect()
+    try:
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO users (username, mobile_number, first_name, last_name, password, created) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (username or None, mobile_number or None, first_name, last_name, password, str(datetime.now())))
+            _bump_generation(conn)
+    except sqlite3.IntegrityError as e:
+        raise ValueError(_conflict_message(e)) from e
+    return cursor.lastrowid
+
+
+# Change the given fields of one user in a single statement, returns False if the user no longer exists
+def update_user(user_id, **fields):
+    unknown = set(fields) - set(COLUMNS[1:-1])
+    if unknown:
+        raise ValueError(f"unknown user fields: {', '.join(sorted(unknown))}")
+    if fields.get("mobile_number") and not MOBILE_NUMBER.match(fields["mobile_number"]):
+        raise ValueError("Please enter a valid 11-digit mobile number.")
+    if not fields:
+        return True
+    conn = _connect()
+    try:
+        with conn:
+            cursor = conn.execute(f"UPDATE users SET {', '.join(f'{name} = ?' for name in fields)} WHERE id = ?",
+                                  [value or None for value in fields.values()] + [user_id])
+            _bump_generation(conn)
+    except sqlite3.IntegrityError as e:
+        raise ValueError(_conflict_message(e)) from e
+    return cursor.rowcount == 1
+
+
+def delete_user(user_id):
+    conn = _connect()
+    with conn:
+        cursor = conn.execute("DELETE FROM users WHERE id = ?", (user_id,))
+        _bump_generation(conn)
+    return cursor.rowcount == 1